@@ -0,0 +1,172 @@
+# ./app/admission.py
+
+import asyncio
+import heapq
+import time
+import traceback
+from collections import Counter, deque
+from utils import logger
+
+# Приоритеты: меньше — раньше
+TEXT_PRIORITY = 0
+VOICE_PRIORITY = 1
+PRIORITY_NAMES = {TEXT_PRIORITY: 'text', VOICE_PRIORITY: 'voice'}
+# Как часто удалять лимиты пользователей, которые давно ничего не присылали
+PRUNE_INTERVAL = 60
+
+
+# Ограничение частоты сообщений одного пользователя
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+    def wait_time(self):
+        """Сколько секунд ждать до следующего токена."""
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+    def is_full(self, now):
+        """Ведро уже наполнилось: удалить его и создать заново — то же самое."""
+        return self.tokens + (now - self.updated) * self.rate >= self.burst
+
+
+# Допуск сообщений в обработку: лимиты и очередь на пользователя, приоритет текста над голосом
+class AdmissionController:
+    """Задачи одного пользователя выполняются по порядку и не параллельно.
+
+    Между пользователями планировщик берёт того, у кого первая задача в очереди
+    дешевле (текст раньше голоса), при равенстве — пришедшую раньше. Задача, ждущая
+    дольше max_wait секунд, идёт вне очереди приоритетов, чтобы голос не голодал под потоком текста.
+    """
+
+    def __init__(self, workers=4, user_rate=1.0, user_burst=5, user_queue_size=5, max_wait=5.0,
+                 notify_interval=10.0):
+        self.workers = workers
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.user_queue_size = user_queue_size
+        self.max_wait = max_wait
+        self.notify_interval = notify_interval
+        self.buckets = {}
+        self.notified = {}
+        self.queues = {}
+        # Готовые к запуску пользователи по приоритетам: куча (seq, user_id, время постановки)
+        self.ready = {}
+        self.active = set()
+        self.seq = 0
+        self.counters = Counter()
+        self._pruned = time.monotonic()
+        self._ready_count = None
+        self._tasks = []
+
+    def submit(self, user_id, priority, job):
+        """Ставит корутинную функцию job в очередь; False, если сообщение отброшено."""
+        kind = PRIORITY_NAMES.get(priority, str(priority))
+        bucket = self.buckets.get(user_id)
+        if bucket is None:
+            self._prune()
+            bucket = self.buckets[user_id] = TokenBucket(self.user_rate, self.user_burst)
+        if not bucket.take():
+            self.counters[f"dropped_rate_{kind}"] += 1
+            return False
+        queue = self.queues.setdefault(user_id, deque())
+        if len(queue) >= self.user_queue_size:
+            self.counters[f"dropped_queue_{kind}"] += 1
+            return False
+        self.seq += 1
+        queue.append((priority, self.seq, job))
+        self.counters[f"queued_{kind}"] += 1
+        if len(queue) == 1 and user_id not in self.active:
+            self._schedule(user_id)
+        return True
+
+    def should_notify(self, user_id):
+        """Предупреждать об отброшенном сообщении не чаще раза в notify_interval: под флудом ответы тоже нагрузка."""
+        now = time.monotonic()
+        if now - self.notified.get(user_id, float('-inf')) < self.notify_interval:
+            self.counters['notify_suppressed'] += 1
+            return False
+        self.notified[user_id] = now
+        return True
+
+    def _prune(self):
+        # Полное ведро ничем не отличается от нового, поэтому лимиты простаивающих пользователей не храним
+        now = time.monotonic()
+        if now - self._pruned < PRUNE_INTERVAL:
+            return
+        self._pruned = now
+        idle = [user_id for user_id, bucket in self.buckets.items()
+                if user_id not in self.queues and user_id not in self.active and bucket.is_full(now)]
+        for user_id in idle:
+            del self.buckets[user_id]
+        for user_id in [user_id for user_id, at in self.notified.items() if now - at >= self.notify_interval]:
+            del self.notified[user_id]
+
+    def _schedule(self, user_id):
+        priority, seq, _ = self.queues[user_id][0]
+        heapq.heappush(self.ready.setdefault(priority, []), (seq, user_id, time.monotonic()))
+        self._ready_count.release()
+
+    def _pop_ready(self):
+        heads = [(priority, heap[0]) for priority, heap in self.ready.items() if heap]
+        now = time.monotonic()
+        aged = [head for head in heads if now - head[1][2] >= self.max_wait]
+        if aged:
+            # Старение: из заждавшихся — пришедшая раньше, независимо от приоритета
+            priority, _ = min(aged, key=lambda head: head[1][0])
+            if priority != min(heads)[0]:
+                self.counters['aged'] += 1
+        else:
+            priority, _ = min(heads)
+        _, user_id, _ = heapq.heappop(self.ready[priority])
+        return user_id
+
+    async def _worker(self):
+        while True:
+            await self._ready_count.acquire()
+            user_id = self._pop_ready()
+            priority, _, job = self.queues[user_id].popleft()
+            self.active.add(user_id)
+            try:
+                await job()
+                self.counters['processed'] += 1
+            except Exception as e:
+                self.counters['failed'] += 1
+                logger.error(f"Ошибка обработки сообщения: {e}\n{traceback.format_exc()}")
+            finally:
+                self.active.discard(user_id)
+                if self.queues[user_id]:
+                    self._schedule(user_id)
+                else:
+                    del self.queues[user_id]
+
+    def pending(self):
+        return sum(len(queue) for queue in self.queues.values())
+
+    def snapshot(self):
+        return {'pending': self.pending(), 'active': len(self.active), 'users': len(self.buckets), **self.counters}
+
+    async def start(self):
+        self._ready_count = asyncio.Semaphore(0)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self, timeout=30.0):
+        """Дожидается уже принятых сообщений, затем останавливает обработчиков."""
+        deadline = time.monotonic() + timeout
+        while (self.pending() or self.active) and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        logger.info(f"Очередь допуска остановлена: {self.snapshot()}")
@@ -0,0 +1,97 @@
+# ./app/audio.py
+
+import io
+import subprocess
+from utils import logger
+
+try:
+    import av
+except ImportError:
+    av = None
+
+# Частота и формат, которые ждёт распознавание речи: 16 кГц, моно, 16 бит
+SAMPLE_RATE = 16000
+SAMPLE_WIDTH = 2
+# Голосовые ответы: Opus 48 кГц моно
+OPUS_SAMPLE_RATE = 48000
+OPUS_FRAME_SIZE = 960
+VOICE_BITRATE = 24000
+
+
+# Декодирование OGG/Opus внутри процесса (PyAV, libopus из колеса)
+def decode_ogg_in_process(data, sample_rate=SAMPLE_RATE):
+    resampler = av.AudioResampler(format='s16', layout='mono', rate=sample_rate)
+    chunks = []
+    with av.open(io.BytesIO(data), format='ogg') as container:
+        for frame in container.decode(audio=0):
+            for resampled in resampler.resample(frame):
+                chunks.append(resampled.to_ndarray().tobytes())
+    for resampled in resampler.resample(None):
+        chunks.append(resampled.to_ndarray().tobytes())
+    return b''.join(chunks)
+
+
+# Запасной путь: ffmpeg через каналы, без промежуточных файлов
+def decode_ogg_ffmpeg(data, sample_rate=SAMPLE_RATE):
+    result = subprocess.run(
+        ['ffmpeg', '-loglevel', 'error', '-i', 'pipe:0', '-f', 's16le', '-ac', '1', '-ar', str(sample_rate), 'pipe:1'],
+        input=data, capture_output=True, check=True, timeout=10)
+    return result.stdout
+
+
+# OGG/Opus голосового сообщения -> PCM s16le моно
+def decode_voice(data, sample_rate=SAMPLE_RATE):
+    if av is not None:
+        try:
+            return decode_ogg_in_process(data, sample_rate)
+        except Exception as e:
+            logger.warning(f"Не удалось декодировать голос в процессе, используется ffmpeg: {e}")
+    return decode_ogg_ffmpeg(data, sample_rate)
+
+
+# Склейка MP3-фрагментов и кодирование в OGG/Opus внутри процесса
+def encode_ogg_opus_in_process(mp3_chunks, bitrate=VOICE_BITRATE):
+    output = io.BytesIO()
+    with av.open(output, 'w', format='ogg') as container:
+        stream = container.add_stream('libopus', rate=OPUS_SAMPLE_RATE)
+        stream.bit_rate = bitrate
+        stream.layout = 'mono'
+        # libopus принимает кадры фиксированной длины (20 мс)
+        resampler = av.AudioResampler(format='s16', layout='mono', rate=OPUS_SAMPLE_RATE,
+                                      frame_size=OPUS_FRAME_SIZE)
+        samples = 0
+
+        def encode(frames):
+            # Метки времени сквозные: у каждого фрагмента они начинаются с нуля
+            nonlocal samples
+            for resampled in frames:
+                resampled.pts = samples
+                samples += resampled.samples
+                container.mux(stream.encode(resampled))
+
+        for chunk in mp3_chunks:
+            with av.open(io.BytesIO(chunk), format='mp3') as source:
+                for frame in source.decode(audio=0):
+                    encode(resampler.resample(frame))
+        encode(resampler.resample(None))
+        container.mux(stream.encode(None))
+    return output.getvalue()
+
+
+# Запасной путь: один процесс ffmpeg, MP3-кадры можно склеивать побайтово
+def encode_ogg_opus_ffmpeg(mp3_chunks, bitrate=VOICE_BITRATE):
+    result = subprocess.run(
+        ['ffmpeg', '-loglevel', 'error', '-f', 'mp3', '-i', 'pipe:0', '-ac', '1', '-c:a', 'libopus',
+         '-b:a', str(bitrate), '-f', 'ogg', 'pipe:1'],
+        input=b''.join(mp3_chunks), capture_output=True, check=True, timeout=30)
+    return result.stdout
+
+
+# MP3 от синтеза речи -> голосовое сообщение Telegram (OGG/Opus)
+def encode_voice(mp3_chunks):
+    if av is not None:
+        try:
+            return encode_ogg_opus_in_process(mp3_chunks)
+        except Exception as e:
+            logger.warning(f"Не удалось закодировать голос в процессе, используется ffmpeg: {e}")
+    return encode_ogg_opus_ffmpeg(mp3_chunks)
@@ -0,0 +1,97 @@
+# ./app/benchmark_entities.py
+
+import argparse
+import time
+from entities import extract_entities
+from utils import clear_phrase, lemmatize_phrase, logger
+
+CORPUS_PATH = 'data/entities_corpus.tsv'
+REPEAT = 200
+FIELDS = ('age', 'age_max', 'price', 'price_min')
+
+
+# Прежнее извлечение возраста: лемматизация и поиск числа перед «год»/«лет» или после «для»
+def legacy_extract_age(replica):
+    words = lemmatize_phrase(replica).split()
+    for i, word in enumerate(words):
+        if word.isdigit() and (i + 1 < len(words) and words[i + 1] in ['год', 'года', 'лет'] or 'для' in words[:i]):
+            return word
+    return None
+
+
+# Прежнее извлечение цены: число перед «рублей» или после «до»/«дешевле»
+def legacy_extract_price(replica):
+    words = clear_phrase(replica).split()
+    for i, word in enumerate(words):
+        if word.isdigit() and (i + 1 < len(words) and words[i + 1] in ['рублей', 'руб'] or 'до' in words[:i]
+                               or 'дешевле' in words[:i]):
+            return int(word)
+    return None
+
+
+def legacy_extract(replica):
+    age = legacy_extract_age(replica)
+    return {'age': int(age) if age else None, 'age_max': None, 'price': legacy_extract_price(replica),
+            'price_min': None}
+
+
+def new_extract(replica):
+    entities = extract_entities(replica)
+    return {field: getattr(entities, field) for field in FIELDS}
+
+
+# Строки корпуса: фраза и ожидаемые значения, пустое поле — None
+def load_corpus(path=CORPUS_PATH):
+    corpus = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.rstrip('\n')
+            if not line or line.startswith('#'):
+                continue
+            phrase, *values = line.split('\t')
+            corpus.append((phrase, {field: int(value) if value else None for field, value in zip(FIELDS, values)}))
+    return corpus
+
+
+# Доля фраз, где все поля совпали, и список ошибок
+def accuracy(extract, corpus):
+    errors = []
+    for phrase, expected in corpus:
+        got = extract(phrase)
+        if got != expected:
+            errors.append((phrase, expected, got))
+    return 1 - len(errors) / len(corpus), errors
+
+
+# Среднее время на фразу в микросекундах
+def measure(extract, phrases, repeat=REPEAT):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for phrase in phrases:
+            extract(phrase)
+    return (time.perf_counter() - start) / (repeat * len(phrases)) * 1e6
+
+
+def _short(values):
+    return ', '.join(f"{field}={value}" for field, value in values.items() if value is not None) or '—'
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Точность и скорость извлечения возраста и цены")
+    parser.add_argument('--repeat', type=int, default=REPEAT)
+    parser.add_argument('--errors', action='store_true', help="печатать фразы с ошибками")
+    args = parser.parse_args()
+    corpus = load_corpus()
+    phrases = [phrase for phrase, _ in corpus]
+    logger.info(f"Корпус извлечения сущностей: {len(corpus)} фраз")
+    # Прогрев: кэш лемматизатора и ленивые загрузки не должны попадать в замер
+    for extract in (legacy_extract, new_extract):
+        for phrase in phrases:
+            extract(phrase)
+    print(f"{'извлечение':12s} {'точность':>9s} {'мкс/фраза':>10s}")
+    for name, extract in (('прежнее', legacy_extract), ('новое', new_extract)):
+        score, errors = accuracy(extract, corpus)
+        print(f"{name:12s} {score:9.1%} {measure(extract, phrases, args.repeat):10.1f}")
+        if args.errors:
+            for phrase, expected, got in errors:
+                print(f"    {phrase!r}: ожидалось {_short(expected)}, получено {_short(got)}")
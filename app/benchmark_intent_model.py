@@ -0,0 +1,42 @@
+# ./app/benchmark_intent_model.py
+
+import pickle
+import time
+from data.config import CONFIG
+from intent_model import CompiledIntentModel
+from utils import lemmatize_phrase, logger
+
+REPEAT = 20
+
+
+# Среднее время одного вызова в микросекундах
+def measure(predict, phrases, repeat=REPEAT):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for phrase in phrases:
+            predict(phrase)
+    return (time.perf_counter() - start) / (repeat * len(phrases)) * 1e6
+
+
+with open('models/intent_model.pkl', 'rb') as f:
+    clf = pickle.load(f)
+with open('models/intent_vectorizer.pkl', 'rb') as f:
+    vectorizer = pickle.load(f)
+compiled = CompiledIntentModel.load('models/intent_compiled.pkl')
+
+phrases = [lemmatize_phrase(ex) for data in CONFIG['intents'].values() for ex in data['examples']]
+phrases = [p for p in phrases if p]
+logger.info(f"Бенчмарк классификатора намерений на {len(phrases)} фразах")
+
+
+def sklearn_predict(phrase):
+    return clf.predict(vectorizer.transform([phrase]))[0]
+
+
+mismatches = sum(sklearn_predict(p) != compiled.predict(p) for p in phrases)
+sklearn_us = measure(sklearn_predict, phrases)
+compiled_us = measure(compiled.predict, phrases)
+
+print(f"sklearn:  {sklearn_us:8.1f} мкс/вызов")
+print(f"compiled: {compiled_us:8.1f} мкс/вызов (x{sklearn_us / compiled_us:.1f})")
+print(f"Расхождений предсказаний: {mismatches} из {len(phrases)}")
@@ -0,0 +1,113 @@
+# ./app/benchmark_logging.py
+
+import logging
+import os
+import queue
+import tempfile
+import time
+from contextlib import contextmanager
+from logging.handlers import QueueListener
+from data.config import CONFIG
+from log_pipeline import JsonFormatter, LazyQueueHandler, SamplingFilter
+from bot import Bot
+
+PHRASES = [
+    'Привет', 'Какие игрушки есть?', 'Игрушки для 5 лет', 'Что есть до 1000 рублей',
+    'Сколько стоит кукла барби?', 'да', 'нет', 'мягкие игрушки', 'Как дела?', 'цена',
+]
+ROUNDS = 2000
+
+
+class Context:
+    def __init__(self):
+        self.user_data = {}
+
+
+# Записи, которые бот выдаёт при обработке PHRASES
+class CaptureHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+
+    def emit(self, record):
+        self.calls.append((record.name, record.levelno, record.msg, record.args))
+
+
+def capture_calls(bot):
+    handler = CaptureHandler()
+    root = logging.getLogger()
+    saved = root.handlers[:]
+    root.handlers = [handler]
+    try:
+        context = Context()
+        for phrase in PHRASES:
+            bot.process(phrase, context)
+    finally:
+        root.handlers = saved
+    return [(logging.getLogger(name), level, msg, args) for name, level, msg, args in handler.calls]
+
+
+# Прежние настройки записей: поиск места вызова по стеку, имя потока и процесса
+@contextmanager
+def legacy_records():
+    saved = logging._srcfile, logging.logThreads, logging.logMultiprocessing
+    logging._srcfile = os.path.normcase(logging.addLevelName.__code__.co_filename)
+    logging.logThreads = logging.logMultiprocessing = True
+    try:
+        yield
+    finally:
+        logging._srcfile, logging.logThreads, logging.logMultiprocessing = saved
+
+
+# Повтор записанных вызовов: время на сообщение в вызывающем потоке и во всём процессе, мкс
+def measure(calls, handler, listener=None, eager=False, rounds=ROUNDS):
+    """eager=True воспроизводит прежние f-строки: сообщение форматируется до вызова логгера."""
+    root = logging.getLogger()
+    saved = root.handlers[:]
+    root.handlers = [handler]
+    if listener:
+        listener.start()
+    start_thread, start_process = time.thread_time(), time.process_time()
+    try:
+        for _ in range(rounds):
+            for logger, level, msg, args in calls:
+                if eager:
+                    logger.log(level, msg % args if args else msg)
+                else:
+                    logger.log(level, msg, *args)
+        thread_cpu = time.thread_time() - start_thread
+        if listener:
+            listener.stop()
+        process_cpu = time.process_time() - start_process
+    finally:
+        root.handlers = saved
+    messages = rounds * len(PHRASES)
+    return thread_cpu / messages * 1e6, process_cpu / messages * 1e6
+
+
+def queue_handler(stream, sampling):
+    log_queue = queue.SimpleQueue()
+    target = logging.StreamHandler(stream)
+    target.setFormatter(JsonFormatter())
+    handler = LazyQueueHandler(log_queue)
+    if sampling:
+        handler.addFilter(SamplingFilter(sampling))
+    return handler, QueueListener(log_queue, target)
+
+
+if __name__ == '__main__':
+    calls = capture_calls(Bot())
+    print(f"Записей лога на {len(PHRASES)} сообщений: {len(calls)}")
+    with tempfile.TemporaryFile('w+', encoding='utf-8') as stream:
+        # Прежняя схема: f-строки и синхронная запись текста в потоке обработки
+        sync_handler = logging.StreamHandler(stream)
+        sync_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+        with legacy_records():
+            results = [('до: f-строки, синхронно', measure(calls, sync_handler, eager=True))]
+        results += [
+            ('очередь, JSON', measure(calls, *queue_handler(stream, None))),
+            ('очередь, JSON, выборка', measure(calls, *queue_handler(stream, CONFIG['logging']['sampling']))),
+        ]
+    print(f"{'схема':26s} {'поток обработки':>16s} {'весь процесс':>14s}")
+    for name, (thread_cpu, process_cpu) in results:
+        print(f"{name:26s} {thread_cpu:10.1f} мкс/сообщ. {process_cpu:8.1f} мкс/сообщ.")
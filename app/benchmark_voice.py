@@ -0,0 +1,64 @@
+# ./app/benchmark_voice.py
+
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import speech_recognition as sr
+from pydub import AudioSegment
+from audio import SAMPLE_RATE, SAMPLE_WIDTH, av, decode_ogg_ffmpeg, decode_ogg_in_process
+
+REPEAT = 20
+
+
+# Прежний путь: ffmpeg через pydub, WAV на диске, повторное чтение через sr.AudioFile
+def legacy_path(data):
+    recognizer = sr.Recognizer()
+    with tempfile.TemporaryDirectory() as tmp:
+        wav_path = os.path.join(tmp, 'voice.wav')
+        AudioSegment.from_ogg(io.BytesIO(data)).export(wav_path, format='wav')
+        with sr.AudioFile(wav_path) as source:
+            return recognizer.record(source)
+
+
+def in_process_path(data):
+    return sr.AudioData(decode_ogg_in_process(data), SAMPLE_RATE, SAMPLE_WIDTH)
+
+
+def ffmpeg_pipe_path(data):
+    return sr.AudioData(decode_ogg_ffmpeg(data), SAMPLE_RATE, SAMPLE_WIDTH)
+
+
+# Задержка и процессорное время на сообщение, включая дочерние процессы
+def measure(path, data, repeat=REPEAT):
+    path(data)
+    before = os.times()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        path(data)
+    wall = (time.perf_counter() - start) / repeat * 1000
+    after = os.times()
+    own_cpu = (after.user + after.system - before.user - before.system) / repeat * 1000
+    child_cpu = (after.children_user + after.children_system
+                 - before.children_user - before.children_system) / repeat * 1000
+    return wall, own_cpu, child_cpu
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        raise SystemExit("Использование: python app/benchmark_voice.py voice.ogg")
+    with open(sys.argv[1], 'rb') as f:
+        voice_data = f.read()
+    paths = [('legacy (pydub + WAV)', legacy_path), ('ffmpeg pipe', ffmpeg_pipe_path)]
+    if av is not None:
+        paths.append(('in-process (PyAV)', in_process_path))
+    print(f"{'путь':24s} {'задержка':>10s} {'CPU процесса':>14s} {'CPU ffmpeg':>12s}")
+    for name, path in paths:
+        try:
+            wall, own_cpu, child_cpu = measure(path, voice_data)
+        except (OSError, subprocess.CalledProcessError) as e:
+            print(f"{name:24s} недоступен: {e}")
+            continue
+        print(f"{name:24s} {wall:8.1f} мс {own_cpu:11.1f} мс {child_cpu:9.1f} мс")
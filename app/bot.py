@@ -1,26 +1,57 @@
 # ./app/bot.py
 
+import io
 import random
+import asyncio
 import pickle
 import os
 import logging
+import time
 import traceback
+from collections import Counter
 from enum import Enum
 from telegram import Update
 from telegram.ext import ApplicationBuilder, CommandHandler, MessageHandler, filters, ContextTypes
 import speech_recognition as sr
 from gtts import gTTS
-from pydub import AudioSegment
 from dotenv import load_dotenv
+from razdel import sentenize
 from data.config import CONFIG
-from sklearn.metrics.pairwise import cosine_similarity
-from utils import clear_phrase, is_meaningful_text, extract_age, extract_toy_name, extract_toy_category, extract_price, \
-    is_age_in_range, Stats, logger, lemmatize_phrase, analyze_sentiment
-from rapidfuzz import process, fuzz
+from sklearn.metrics.pairwise import linear_kernel
+from intent_model import CompiledIntentModel, fuzzy_examples, fuzzy_intent
+from catalog import CATALOG
+from audio import decode_voice, encode_voice, SAMPLE_RATE, SAMPLE_WIDTH
+from admission import AdmissionController, TEXT_PRIORITY, VOICE_PRIORITY
+from profiling import MessageProfiler
+from outbound import OutboundDispatcher
+from entities import extract_entities
+from templates import Fragments, Template, compile_responses
+from utils import clear_phrase, is_meaningful_text, extract_toy_name, extract_toy_category, \
+    Stats, LRUCache, logger, lemmatize_phrase, lemmatize_fast, analyze_sentiment
 
 # Загрузка токена
 load_dotenv()
 TOKEN = os.getenv('TELEGRAM_TOKEN')
+# Адреса Bot API можно переопределить, например для нагрузочного теста
+TELEGRAM_API_URL = os.getenv('TELEGRAM_API_URL')
+TELEGRAM_FILE_URL = os.getenv('TELEGRAM_FILE_URL')
+# Режим работы: polling или webhook
+BOT_MODE = os.getenv('BOT_MODE', 'polling')
+WEBHOOK_URL = os.getenv('WEBHOOK_URL')
+WEBHOOK_LISTEN = os.getenv('WEBHOOK_LISTEN', '0.0.0.0')
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', '8443'))
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', 'telegram')
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET')
+# Число процессов-воркеров, больше 1 — шардирование по chat_id
+BOT_WORKERS = int(os.getenv('BOT_WORKERS', '1'))
+# Администраторы (через запятую): им доступна команда /profile
+ADMIN_IDS = {int(user_id) for user_id in os.getenv('ADMIN_IDS', '').split(',') if user_id.strip()}
+# Журнал обработки каждой реплики, прореживается по CONFIG['logging']['sampling']
+dialog_logger = logging.getLogger('bot.dialog')
+# По времени изменения матрицы диалогов бот замечает переобучение
+DIALOGUES_MATRIX_PATH = 'models/dialogues_matrix.pkl'
+# Реклама случайной игрушки в конце ответа
+AD_TEMPLATE = Template(" Кстати, у нас есть [toy_name] — отличный выбор для детей [age]!")
 
 
 # Состояния бота
@@ -54,6 +85,57 @@ class ResponseType(Enum):
     FAILURE = "failure"
 
 
+# Случайная игрушка каталога, отличная от exclude; None, если каталог пуст
+def random_toy(exclude=None):
+    names = CATALOG.names
+    if not names:
+        return None
+    while True:
+        toy_name = random.choice(names)
+        if toy_name != exclude or len(names) == 1:
+            return toy_name
+
+
+# Бюджет времени одного сообщения: создаётся при его приёме и передаётся по цепочке обработки
+class MessageBudget:
+    """Решает, какие необязательные этапы пропустить; хранит разбор реплики на время сообщения."""
+
+    __slots__ = ('deadline', 'overloaded', 'degradations', 'entities', 'classified')
+
+    def __init__(self, deadline=None, overloaded=False, degradations=None):
+        self.deadline = deadline
+        self.overloaded = overloaded
+        self.degradations = degradations if degradations is not None else Counter()
+        self.entities = None
+        self.classified = None
+
+    @classmethod
+    def start(cls, context, degradations=None, voice=False):
+        """Запускает отсчёт и проверяет глубину очереди допуска."""
+        settings = CONFIG['latency_budget']
+        if not settings['enabled']:
+            return cls(degradations=degradations)
+        seconds = settings['voice_seconds' if voice else 'seconds']
+        admission = getattr(context, 'bot_data', {}).get('admission')
+        overloaded = admission is not None and admission.pending() >= settings['queue_depth']
+        return cls(time.monotonic() + seconds, overloaded, degradations)
+
+    def over_budget(self, stage):
+        """True, если необязательный этап stage нужно пропустить; такие пропуски считаются."""
+        if self.deadline is None:
+            return False
+        if self.overloaded or time.monotonic() > self.deadline:
+            self.degradations[stage] += 1
+            return True
+        return False
+
+
+# Реклама случайной игрушки в конце ответа; пустая строка, если каталог пуст
+def ad_suffix(exclude=None):
+    toy_name = random_toy(exclude)
+    return AD_TEMPLATE.render(CATALOG.fragments(toy_name)) if toy_name else ""
+
+
 # Класс бота
 class Bot:
     def __init__(self):
@@ -63,15 +145,90 @@ class Bot:
                 self.clf = pickle.load(f)
             with open('models/intent_vectorizer.pkl', 'rb') as f:
                 self.vectorizer = pickle.load(f)
-            with open('models/dialogues_vectorizer.pkl', 'rb') as f:
-                self.tfidf_vectorizer = pickle.load(f)
-            with open('models/dialogues_matrix.pkl', 'rb') as f:
-                self.tfidf_matrix = pickle.load(f)
-            with open('models/dialogues_answers.pkl', 'rb') as f:
-                self.answers = pickle.load(f)
+            self._load_dialogues()
         except FileNotFoundError as e:
             logger.error(f"Не найдены файлы модели: {e}\n{traceback.format_exc()}")
             raise
+        try:
+            self.compiled_intent_model = CompiledIntentModel.load('models/intent_compiled.pkl')
+        except FileNotFoundError:
+            logger.warning("Компактная модель намерений не найдена, используется sklearn")
+            self.compiled_intent_model = None
+        # Массивы фильтра каталога собираются вместе с моделями, а не на первом запросе с фильтром
+        CATALOG.filter_index
+        self.fuzzy_examples = fuzzy_examples(
+            {intent: data.get('examples', []) for intent, data in CONFIG['intents'].items()}, lemmatize_fast)
+        # Ответы и фразы неудачи разбираются в шаблоны один раз
+        self.responses = compile_responses(CONFIG['intents'])
+        self.failure_templates = [Template(phrase) for phrase in CONFIG['failure_phrases']]
+        self.dialogue_cache = LRUCache(CONFIG['dialogue_cache']['size'])
+        self._dialogues_checked = time.monotonic()
+        # Пропуски необязательных этапов по всем сообщениям; бюджет у каждого сообщения свой
+        self.degradations = Counter()
+
+    def _load_dialogues(self):
+        """Загрузка модели диалогов и запоминание её версии."""
+        mtime = os.path.getmtime(DIALOGUES_MATRIX_PATH)
+        with open('models/dialogues_vectorizer.pkl', 'rb') as f:
+            tfidf_vectorizer = pickle.load(f)
+        with open(DIALOGUES_MATRIX_PATH, 'rb') as f:
+            tfidf_matrix = pickle.load(f)
+        with open('models/dialogues_answers.pkl', 'rb') as f:
+            answers = pickle.load(f)
+        if tfidf_matrix.shape[0] != len(answers):
+            raise ValueError(f"матрица диалогов ({tfidf_matrix.shape[0]}) не совпадает с ответами ({len(answers)})")
+        self.tfidf_vectorizer, self.tfidf_matrix, self.answers = tfidf_vectorizer, tfidf_matrix, answers
+        self.dialogues_mtime = mtime
+
+    def _refresh_dialogues(self):
+        """Перечитывает модель диалогов после переобучения и сбрасывает кэш поиска."""
+        now = time.monotonic()
+        if now - self._dialogues_checked < CONFIG['dialogue_cache']['check_interval']:
+            return
+        self._dialogues_checked = now
+        try:
+            if os.path.getmtime(DIALOGUES_MATRIX_PATH) == self.dialogues_mtime:
+                return
+            self._load_dialogues()
+        except (OSError, ValueError, pickle.UnpicklingError, EOFError) as e:
+            # Файлы могут дописываться прямо сейчас — попробуем при следующей проверке
+            logger.warning(f"Не удалось перечитать модель диалогов: {e}")
+            return
+        self.dialogue_cache.clear()
+        logger.info("Модель диалогов обновлена, кэш поиска сброшен")
+
+    # Ближайшая реплика из диалогов: (индекс, сходство), с кэшем по лемматизированной реплике
+    def _find_dialogue(self, replica_lemmatized):
+        self._refresh_dialogues()
+        found = self.dialogue_cache.get(replica_lemmatized)
+        if found is None:
+            replica_vector = self.tfidf_vectorizer.transform([replica_lemmatized])
+            # Строки TF-IDF нормированы (L2), скалярное произведение равно косинусу
+            similarities = linear_kernel(replica_vector, self.tfidf_matrix).flatten()
+            best_idx = int(similarities.argmax())
+            found = (best_idx, float(similarities[best_idx]))
+            self.dialogue_cache.put(replica_lemmatized, found)
+        lookups = self.dialogue_cache.hits + self.dialogue_cache.misses
+        if lookups % CONFIG['dialogue_cache']['log_every'] == 0:
+            logger.info(f"Кэш поиска по диалогам: {self.dialogue_cache.stats()}")
+        return found
+
+    def start_budget(self, context, voice=False):
+        """Бюджет нового сообщения; для голосового он включает загрузку и распознавание."""
+        return MessageBudget.start(context, self.degradations, voice)
+
+    def _sentiment(self, replica, budget):
+        """Тональность для реакции в ответе; при нехватке времени — нейтральная."""
+        if budget.over_budget('sentiment'):
+            return 'neutral'
+        return analyze_sentiment(replica)
+
+    def _predict_intent(self, replica_lemmatized):
+        """Предсказывает намерение компактной моделью или через sklearn."""
+        if self.compiled_intent_model:
+            return self.compiled_intent_model.predict(replica_lemmatized)
+        vectorized = self.vectorizer.transform([replica_lemmatized])
+        return self.clf.predict(vectorized)[0]
 
     def _update_context(self, context, replica, answer, intent=None):
         """Обновляет контекст пользователя."""
@@ -87,41 +244,44 @@ class Bot:
         if intent:
             context.user_data['last_intent'] = intent
 
-    def classify_intent(self, replica):
-        """Классифицирует намерение пользователя."""
+    def extract_entities(self, replica, budget):
+        """Возраст и цена из реплики; разбор выполняется один раз на сообщение."""
+        if budget.entities is None or budget.entities[0] != replica:
+            budget.entities = (replica, extract_entities(replica))
+        return budget.entities[1]
+
+    def classify_intent(self, replica, budget):
+        """Классифицирует намерение пользователя; результат запоминается до конца сообщения."""
+        if budget.classified is not None and budget.classified[0] == replica:
+            return budget.classified[1]
+        intent = self._classify_intent(replica, budget)
+        budget.classified = (replica, intent)
+        return intent
+
+    def _classify_intent(self, replica, budget):
         replica_lemmatized = lemmatize_phrase(replica)
         if not replica_lemmatized:
             return None
-        vectorized = self.vectorizer.transform([replica_lemmatized])
-        intent = self.clf.predict(vectorized)[0]
-        best_score = 0
-        best_intent = None
-        for intent_key, data in CONFIG['intents'].items():
-            examples = [lemmatize_phrase(ex) for ex in data.get('examples', []) if lemmatize_phrase(ex)]
-            if not examples:
-                continue
-            match = process.extractOne(replica_lemmatized, examples, scorer=fuzz.ratio)
-            if match and match[1] / 100 > best_score and match[1] / 100 >= CONFIG['thresholds']['intent_score']:
-                best_score = match[1] / 100
-                best_intent = intent_key
-        logger.info(
-            f"Classify intent: replica='{replica_lemmatized}', predicted='{intent}', best_intent='{best_intent}', score={best_score}")
+        intent = self._predict_intent(replica_lemmatized)
+        examples = self.fuzzy_examples
+        if budget.over_budget('fuzzy_intent'):
+            # Без полного поиска реплика сверяется только с примерами предсказанного намерения
+            examples = {intent: examples[intent]} if intent in examples else {}
+        best_intent, best_score = fuzzy_intent(lemmatize_fast(replica), examples,
+                                               CONFIG['thresholds']['intent_score'])
+        dialog_logger.info("Classify intent: replica='%s', predicted='%s', best_intent='%s', score=%s",
+                           replica_lemmatized, intent, best_intent, best_score)
         return best_intent or intent if best_score >= CONFIG['thresholds']['intent_score'] else None
 
-    def _get_toy_response(self, intent, toy_name, replica, context):
+    def _get_toy_response(self, intent, toy_name, replica, context, budget):
         """Обрабатывает запросы, связанные с конкретной игрушкой."""
-        if toy_name not in CONFIG['toys']:
+        fragments = CATALOG.fragments(toy_name)
+        if fragments is None:
             return "Извините, такой игрушки нет в каталоге."
-        responses = CONFIG['intents'][intent]['responses']
-        answer = random.choice(responses)
-        toy_data = CONFIG['toys'][toy_name]
-        answer = answer.replace('[toy_name]', toy_name)
-        answer = answer.replace('[price]', str(toy_data['price']))
-        answer = answer.replace('[age]', f"{toy_data['age']['min_age']}-{toy_data['age']['max_age'] or 'и старше'}")
-        answer = answer.replace('[description]', toy_data.get('description', 'интересная игрушка'))
+        answer = random.choice(self.responses[intent]).render(fragments)
 
         # Добавляем реакцию на тональность
-        sentiment = analyze_sentiment(replica)
+        sentiment = self._sentiment(replica, budget)
         if sentiment == 'positive':
             answer += " Рад, что вы в хорошем настроении! 😊"
         elif sentiment == 'negative':
@@ -138,7 +298,7 @@ class Bot:
         if last_response and 'Кстати, у нас есть' in last_response:
             return extract_toy_name(last_response)
         elif toy_category:
-            suitable_toys = [toy for toy, data in CONFIG['toys'].items() if toy_category in data.get('categories', [])]
+            suitable_toys = CATALOG.toys_in_category(toy_category)
             return random.choice(suitable_toys) if suitable_toys else None
         elif last_intent == Intent.TOY_TYPES.value:
             for hist in context.user_data.get('history', [])[::-1]:
@@ -147,58 +307,59 @@ class Bot:
                     return hist_toy
                 hist_category = extract_toy_category(hist)
                 if hist_category:
-                    suitable_toys = [toy for toy, data in CONFIG['toys'].items() if
-                                     hist_category in data.get('categories', [])]
+                    suitable_toys = CATALOG.toys_in_category(hist_category)
                     if suitable_toys:
                         return random.choice(suitable_toys)
         return None
 
-    def _handle_filter_toys(self, age, price, toy_category, context):
-        """Обрабатывает фильтрацию игрушек по возрасту, цене и категории."""
-        suitable_toys = [
-            toy for toy, data in CONFIG['toys'].items()
-            if (not age or is_age_in_range(age, data['age']))
-               and (not price or data['price'] <= price)
-               and (not toy_category or toy_category in data.get('categories', []))
-        ]
+    def _handle_filter_toys(self, age, price, toy_category, context, min_price=None, age_max=None):
+        """Обрабатывает фильтрацию игрушек по возрасту (или диапазону возраста), цене и категории."""
+        suitable_toys = CATALOG.filter(age, price, toy_category, min_price, age_max)
         recent_toys = [extract_toy_name(h) for h in context.user_data.get('history', [])]
         suitable_toys = [t for t in suitable_toys if t not in recent_toys]
+        ages = f"от {age} до {age_max}" if age_max and age_max != age else age
 
         if not suitable_toys:
             conditions = []
             if age:
-                conditions.append(f"возраста {age} лет")
-            if price:
+                conditions.append(f"возраста {ages} лет")
+            if min_price and price:
+                conditions.append(f"от {min_price} до {price} рублей")
+            elif min_price:
+                conditions.append(f"от {min_price} рублей")
+            elif price:
                 conditions.append(f"до {price} рублей")
             if toy_category:
                 conditions.append(f"в категории {toy_category}")
             return f"Извините, нет игрушек для {', '.join(conditions)}."
 
         toys_list = ', '.join(suitable_toys)
-        if age and not price and not toy_category:
+        if age and not price and not min_price and not toy_category:
             toy_name = random.choice(suitable_toys)
             context.user_data['current_toy'] = toy_name
             context.user_data['state'] = BotState.WAITING_FOR_INTENT.value
-            return f"Для возраста {age} лет советую {toy_name}! Хотите узнать цену или описание?"
+            return f"Для возраста {ages} лет советую {toy_name}! Хотите узнать цену или описание?"
         return f"Вот что нашлось: {toys_list}."
 
-    def get_answer_by_intent(self, intent, replica, context):
+    def get_answer_by_intent(self, intent, replica, context, budget):
         """Генерирует ответ на основе намерения."""
         toy_name = context.user_data.get('current_toy')
         last_intent = context.user_data.get('last_intent', '')
         toy_category = extract_toy_category(replica)
-        age = extract_age(replica)
-        price = extract_price(replica)
+        entities = self.extract_entities(replica, budget)
+        age = entities.age
+        price = entities.price
 
         if intent not in CONFIG['intents']:
             return None
-        responses = CONFIG['intents'][intent]['responses']
+        responses = self.responses[intent]
         if not responses:
             return None
-        answer = random.choice(responses)
+        template = random.choice(responses)
+        answer = template.text
 
         # Добавляем реакцию на тональность
-        sentiment = analyze_sentiment(replica)
+        sentiment = self._sentiment(replica, budget)
         sentiment_suffix = ""
         if sentiment == 'positive':
             sentiment_suffix = " Рад, что вы в хорошем настроении! 😊"
@@ -215,49 +376,49 @@ class Bot:
                     return f"Из {toy_category or 'игрушек'} есть {toy_name}. Хотите узнать цену, описание или наличие?{sentiment_suffix}"
                 context.user_data['state'] = BotState.WAITING_FOR_TOY.value
                 return f"Какую игрушку или категорию вы имеете в виду?{sentiment_suffix}"
-            return self._get_toy_response(intent, toy_name, replica, context)
+            return self._get_toy_response(intent, toy_name, replica, context, budget)
 
         elif intent == Intent.TOY_RECOMMENDATION.value:
             if age:
-                answer = self._handle_filter_toys(age, None, toy_category, context)
+                answer = self._handle_filter_toys(age, None, toy_category, context, age_max=entities.age_max)
             else:
                 context.user_data['state'] = BotState.WAITING_FOR_AGE.value
                 return f"Для какого возраста нужна игрушка?{sentiment_suffix}"
 
         elif intent == Intent.FILTER_TOYS.value:
-            if age or price or toy_category:
-                answer = self._handle_filter_toys(age, price, toy_category, context)
+            if age or price or entities.price_min or toy_category:
+                answer = self._handle_filter_toys(age, price, toy_category, context, entities.price_min,
+                                                  entities.age_max)
             else:
                 return f"Укажите возраст, цену или категорию для фильтрации.{sentiment_suffix}"
 
         elif intent == Intent.TOY_TYPES.value:
-            categories = random.sample([cat for toy in CONFIG['toys'].values() for cat in toy.get('categories', [])],
-                                       min(3, len(CONFIG['toys'])))
-            toys = random.sample(list(CONFIG['toys'].keys()), min(2, len(CONFIG['toys'])))
+            categories = random.sample(CATALOG.categories_flat, min(3, len(CATALOG)))
+            toys = random.sample(CATALOG.names, min(2, len(CATALOG)))
             answer = f"У нас есть {', '.join(set(categories))} и игрушки вроде {', '.join(toys)}. Что интересно?{sentiment_suffix}"
             context.user_data['current_toy'] = None
 
         elif intent == Intent.COMPARE_TOYS.value:
-            toy1 = random.choice(list(CONFIG['toys'].keys()))
-            toy2 = random.choice([t for t in CONFIG['toys'].keys() if t != toy1])
-            answer = answer.replace('[toy1]', toy1).replace('[toy2]', toy2)
+            toy1 = random_toy()
+            if toy1 is None:
+                return f"Каталог пока пуст, сравнивать нечего.{sentiment_suffix}"
+            toy2 = random_toy(exclude=toy1)
+            answer = template.render(Fragments(toy1=toy1, toy2=toy2))
             context.user_data['current_toy'] = toy1
             answer += f" Что интересует: {toy1} или {toy2}?{sentiment_suffix}"
 
         elif intent == Intent.YES.value:
             if last_intent == Intent.HELLO.value:
-                categories = random.sample(
-                    [cat for toy in CONFIG['toys'].values() for cat in toy.get('categories', [])],
-                    min(3, len(CONFIG['toys'])))
+                categories = random.sample(CATALOG.categories_flat, min(3, len(CATALOG)))
                 answer = f"Отлично! У нас есть {', '.join(set(categories))}. Что хотите узнать?{sentiment_suffix}"
             elif last_intent in [Intent.TOY_PRICE.value, Intent.TOY_INFO.value, Intent.TOY_AVAILABILITY.value,
                                  Intent.ORDER_TOY.value]:
                 if toy_name:
-                    answer = f"Цена на {toy_name} — {CONFIG['toys'][toy_name]['price']} рублей. Что ещё интересует?{sentiment_suffix}"
+                    answer = f"Цена на {toy_name} — {CATALOG.get(toy_name)['price']} рублей. Что ещё интересует?{sentiment_suffix}"
                 else:
                     answer = f"Назови игрушку, чтобы я рассказал подробнее!{sentiment_suffix}"
             elif last_intent == Intent.TOY_TYPES.value:
-                toys = random.sample(list(CONFIG['toys'].keys()), min(2, len(CONFIG['toys'])))
+                toys = random.sample(CATALOG.names, min(2, len(CATALOG)))
                 answer = f"У нас есть {', '.join(toys)}. Назови одну, чтобы узнать больше!{sentiment_suffix}"
             elif last_intent == 'offtopic':
                 answer = f"Хорошо, давай продолжим! Хочешь узнать про игрушки?{sentiment_suffix}"
@@ -270,219 +431,262 @@ class Bot:
             answer = f"Хорошо, какую игрушку обсудим теперь?{sentiment_suffix}"
 
         if intent in [Intent.HELLO.value, Intent.TOY_TYPES.value] and random.random() < 0.2:
-            ad_toy = random.choice([t for t in CONFIG['toys'].keys() if t != toy_name])
-            answer += f" Кстати, у нас есть {ad_toy} — отличный выбор для детей {CONFIG['toys'][ad_toy]['age']['min_age']}-{CONFIG['toys'][ad_toy]['age']['max_age'] or 'и старше'}!{sentiment_suffix}"
+            ad = ad_suffix(exclude=toy_name)
+            if ad:
+                answer += ad + sentiment_suffix
 
         context.user_data['last_intent'] = intent
         return answer
 
-    def generate_answer(self, replica, context):
+    def generate_answer(self, replica, context, budget):
         """Генерирует ответ на основе диалогов."""
         replica_lemmatized = lemmatize_phrase(replica)
         if not replica_lemmatized or not self.answers:
             return None
         if not is_meaningful_text(replica):
             return None
-        replica_vector = self.tfidf_vectorizer.transform([replica_lemmatized])
-        similarities = cosine_similarity(replica_vector, self.tfidf_matrix).flatten()
-        best_idx = similarities.argmax()
-        if similarities[best_idx] > CONFIG['thresholds']['dialogues_similarity']:
+        if budget.over_budget('retrieval'):
+            return None
+        best_idx, similarity = self._find_dialogue(replica_lemmatized)
+        if similarity > CONFIG['thresholds']['dialogues_similarity']:
             answer = self.answers[best_idx]
-            logger.info(
-                f"Found in dialogues.txt: replica='{replica_lemmatized}', answer='{answer}', similarity={similarities[best_idx]}")
+            dialog_logger.info("Found in dialogues.txt: replica='%s', answer='%s', similarity=%s",
+                               replica_lemmatized, answer, similarity)
             # Добавляем реакцию на тональность
-            sentiment = analyze_sentiment(replica)
+            sentiment = self._sentiment(replica, budget)
             if sentiment == 'positive':
                 answer += " Рад, что ты в хорошем настроении! 😊"
             elif sentiment == 'negative':
                 answer += " Кажется, ты не в духе. Может, игрушка поднимет настроение? 😊"
             if random.random() < 0.3:
-                ad_toy = random.choice(list(CONFIG['toys'].keys()))
-                answer += f" Кстати, у нас есть {ad_toy} — отличный выбор для детей {CONFIG['toys'][ad_toy]['age']['min_age']}-{CONFIG['toys'][ad_toy]['age']['max_age'] or 'и старше'}!"
+                answer += ad_suffix()
             context.user_data['last_intent'] = 'offtopic'
             return answer
-        logger.info(f"No match in dialogues.txt for replica='{replica_lemmatized}'")
+        dialog_logger.info("No match in dialogues.txt for replica='%s'", replica_lemmatized)
         return None
 
-    def get_failure_phrase(self, replica):
+    def get_failure_phrase(self, replica, budget):
         """Возвращает фразу при неудачном запросе с учетом тональности."""
-        toy_name = random.choice(list(CONFIG['toys'].keys()))
-        answer = random.choice(CONFIG['failure_phrases']).replace('[toy_name]', toy_name)
-        sentiment = analyze_sentiment(replica)
+        toy_name = random_toy()
+        if toy_name:
+            answer = random.choice(self.failure_templates).render(CATALOG.fragments(toy_name))
+        else:
+            answer = "Не понял вас. Попробуйте спросить иначе."
+        sentiment = self._sentiment(replica, budget)
         if sentiment == 'positive':
             answer += " Ты в отличном настроении, давай найдем крутую игрушку! 😊"
         elif sentiment == 'negative':
             answer += " Не переживай, давай подберем что-то интересное! 😊"
         return answer
 
-    def _process_none_state(self, replica, context):
+    def _process_none_state(self, replica, context, budget):
         """Обрабатывает состояние NONE."""
         toy_name = extract_toy_name(replica)
         if toy_name:
             context.user_data['current_toy'] = toy_name
             context.user_data['state'] = BotState.WAITING_FOR_INTENT.value
-            sentiment = analyze_sentiment(replica)
+            sentiment = self._sentiment(replica, budget)
             suffix = " Рад, что ты в хорошем настроении! 😊" if sentiment == 'positive' else " Кажется, ты не в духе. Давай найдем что-то крутое? 😊" if sentiment == 'negative' else ""
             return f"Вы имеете в виду {toy_name}? Хотите узнать цену, описание или наличие?{suffix}"
 
         toy_category = extract_toy_category(replica)
         if toy_category:
-            suitable_toys = [toy for toy, data in CONFIG['toys'].items() if toy_category in data.get('categories', [])]
+            suitable_toys = CATALOG.toys_in_category(toy_category)
             if suitable_toys:
                 toy_name = random.choice(suitable_toys)
                 context.user_data['current_toy'] = toy_name
                 context.user_data['state'] = BotState.WAITING_FOR_INTENT.value
-                sentiment = analyze_sentiment(replica)
+                sentiment = self._sentiment(replica, budget)
                 suffix = " Ты в отличном настроении, давай продолжим! 😊" if sentiment == 'positive' else " Не грусти, найдем что-то классное! 😊" if sentiment == 'negative' else ""
                 return f"Из {toy_category} есть {toy_name}. Хотите узнать цену, описание или наличие?{suffix}"
-            sentiment = analyze_sentiment(replica)
+            sentiment = self._sentiment(replica, budget)
             suffix = " В хорошем настроении? Давай попробуем другую категорию! 😊" if sentiment == 'positive' else " Не переживай, попробуем другую категорию! 😊" if sentiment == 'negative' else ""
             return f"У нас нет игрушек в категории {toy_category}. Попробуйте другую категорию!{suffix}"
 
-        intent = self.classify_intent(replica)
+        intent = self.classify_intent(replica, budget)
         if intent:
-            return self.get_answer_by_intent(intent, replica, context)
+            return self.get_answer_by_intent(intent, replica, context, budget)
 
-        return self.generate_answer(replica, context) or self.get_failure_phrase(replica)
+        return self.generate_answer(replica, context, budget) or self.get_failure_phrase(replica, budget)
 
-    def _process_waiting_for_toy(self, replica, context):
+    def _process_waiting_for_toy(self, replica, context, budget):
         """Обрабатывает состояние WAITING_FOR_TOY."""
         toy_name = extract_toy_name(replica)
         if toy_name:
             context.user_data['current_toy'] = toy_name
             context.user_data['state'] = BotState.WAITING_FOR_INTENT.value
-            sentiment = analyze_sentiment(replica)
+            sentiment = self._sentiment(replica, budget)
             suffix = " Отличное настроение, да? 😊" if sentiment == 'positive' else " Давай найдем что-то веселое! 😊" if sentiment == 'negative' else ""
             return f"Вы имеете в виду {toy_name}? Хотите узнать цену, описание или наличие?{suffix}"
         toy_category = extract_toy_category(replica)
         if toy_category:
-            suitable_toys = [toy for toy, data in CONFIG['toys'].items() if toy_category in data.get('categories', [])]
+            suitable_toys = CATALOG.toys_in_category(toy_category)
             if suitable_toys:
                 toy_name = random.choice(suitable_toys)
                 context.user_data['current_toy'] = toy_name
                 context.user_data['state'] = BotState.WAITING_FOR_INTENT.value
-                sentiment = analyze_sentiment(replica)
+                sentiment = self._sentiment(replica, budget)
                 suffix = " В хорошем расположении духа? 😊" if sentiment == 'positive' else " Не грусти, найдем игрушку! 😊" if sentiment == 'negative' else ""
                 return f"Из {toy_category} есть {toy_name}. Хотите узнать цену, описание или наличие?{suffix}"
-        sentiment = analyze_sentiment(replica)
+        sentiment = self._sentiment(replica, budget)
         suffix = " Отлично, давай продолжим! 😊" if sentiment == 'positive' else " Не переживай, уточним! 😊" if sentiment == 'negative' else ""
         return f"Пожалуйста, уточните название игрушки или категорию.{suffix}"
 
-    def _process_waiting_for_age(self, replica, context):
+    def _process_waiting_for_age(self, replica, context, budget):
         """Обрабатывает состояние WAITING_FOR_AGE."""
-        age = extract_age(replica)
-        if age:
+        entities = self.extract_entities(replica, budget)
+        if entities.age:
             context.user_data['state'] = BotState.NONE.value
-            return self._handle_filter_toys(age, None, None, context)
-        sentiment = analyze_sentiment(replica)
+            return self._handle_filter_toys(entities.age, None, None, context, age_max=entities.age_max)
+        sentiment = self._sentiment(replica, budget)
         suffix = " В хорошем настроении? 😊" if sentiment == 'positive' else " Не переживай, уточним! 😊" if sentiment == 'negative' else ""
         return f"Укажите возраст, например, '5 лет'.{suffix}"
 
-    def _process_waiting_for_intent(self, replica, context):
+    def _process_waiting_for_intent(self, replica, context, budget):
         """Обрабатывает состояние WAITING_FOR_INTENT."""
         # Проверяем, указана ли конкретная игрушка в запросе
         toy_name = extract_toy_name(replica)
-        if toy_name and toy_name in CONFIG['toys']:
+        if toy_name and toy_name in CATALOG:
             context.user_data['current_toy'] = toy_name
         else:
             toy_name = context.user_data.get('current_toy', 'игрушку')
 
-        intent = self.classify_intent(replica)
+        intent = self.classify_intent(replica, budget)
         if intent in [Intent.TOY_PRICE.value, Intent.TOY_AVAILABILITY.value, Intent.TOY_INFO.value,
                       Intent.ORDER_TOY.value]:
             context.user_data['state'] = BotState.NONE.value
-            return self._get_toy_response(intent, toy_name, replica, context)
+            return self._get_toy_response(intent, toy_name, replica, context, budget)
         if intent == Intent.YES.value:
             if toy_name:
                 context.user_data['state'] = BotState.NONE.value
-                sentiment = analyze_sentiment(replica)
+                sentiment = self._sentiment(replica, budget)
                 suffix = " Рад твоему настроению! 😊" if sentiment == 'positive' else " Давай поднимем настроение! 😊" if sentiment == 'negative' else ""
-                return f"Цена на {toy_name} — {CONFIG['toys'][toy_name]['price']} рублей. Что ещё интересует?{suffix}"
+                return f"Цена на {toy_name} — {CATALOG.get(toy_name)['price']} рублей. Что ещё интересует?{suffix}"
         if intent == Intent.NO.value:
             context.user_data['current_toy'] = None
             context.user_data['state'] = BotState.NONE.value
-            sentiment = analyze_sentiment(replica)
+            sentiment = self._sentiment(replica, budget)
             suffix = " Отлично, продолжаем! 😊" if sentiment == 'positive' else " Не грусти, найдем другое! 😊" if sentiment == 'negative' else ""
             return f"Хорошо, какую игрушку обсудим теперь?{suffix}"
-        sentiment = analyze_sentiment(replica)
+        sentiment = self._sentiment(replica, budget)
         suffix = " В хорошем настроении? 😊" if sentiment == 'positive' else " Не переживай, найдем что-то классное! 😊" if sentiment == 'negative' else ""
         return f"Что хотите узнать про {toy_name}: цену, описание или наличие?{suffix}"
 
-    def process(self, replica, context):
+    def process(self, replica, context, budget=None):
         """Обрабатывает запрос пользователя."""
+        if budget is None:
+            budget = self.start_budget(context)
         stats = Stats(context)
         if not is_meaningful_text(replica):
-            answer = self.get_failure_phrase(replica)
+            answer = self.get_failure_phrase(replica, budget)
             self._update_context(context, replica, answer)
             stats.add(ResponseType.FAILURE.value, replica, answer, context)
             return answer
 
-        age = extract_age(replica)
-        price = extract_price(replica)
+        entities = self.extract_entities(replica, budget)
         toy_category = extract_toy_category(replica)
-        if age or price:
-            answer = self._handle_filter_toys(age, price, toy_category, context)
+        if entities.age or entities.price or entities.price_min:
+            answer = self._handle_filter_toys(entities.age, entities.price, toy_category, context, entities.price_min,
+                                              entities.age_max)
             self._update_context(context, replica, answer, Intent.FILTER_TOYS.value)
             stats.add(ResponseType.INTENT.value, replica, answer, context)
             return answer
 
         state = context.user_data.get('state', BotState.NONE.value)
-        logger.info(
-            f"Processing: replica='{replica}', state='{state}', last_intent='{context.user_data.get('last_intent')}'")
+        dialog_logger.info("Processing: replica='%s', state='%s', last_intent='%s'",
+                           replica, state, context.user_data.get('last_intent'))
 
         if state == BotState.WAITING_FOR_TOY.value:
-            answer = self._process_waiting_for_toy(replica, context)
+            answer = self._process_waiting_for_toy(replica, context, budget)
         elif state == BotState.WAITING_FOR_AGE.value:
-            answer = self._process_waiting_for_age(replica, context)
+            answer = self._process_waiting_for_age(replica, context, budget)
         elif state == BotState.WAITING_FOR_INTENT.value:
-            answer = self._process_waiting_for_intent(replica, context)
+            answer = self._process_waiting_for_intent(replica, context, budget)
         else:
-            answer = self._process_none_state(replica, context)
+            answer = self._process_none_state(replica, context, budget)
 
         self._update_context(context, replica, answer)
         stats.add(ResponseType.INTENT.value if self.classify_intent(
-            replica) else ResponseType.GENERATE.value if 'dialogues.txt' in answer else ResponseType.FAILURE.value,
+            replica, budget) else ResponseType.GENERATE.value if 'dialogues.txt' in answer else ResponseType.FAILURE.value,
                   replica, answer, context)
         return answer
 
 
 # Голос в текст
-def voice_to_text(voice_file):
+def voice_to_text(voice_data):
     recognizer = sr.Recognizer()
+    # Таймаут 5 секунд; signal.alarm не работает вне главного потока
+    recognizer.operation_timeout = 5
     try:
-        import signal
-        def signal_handler(signum, frame):
-            raise TimeoutError("Speech recognition timed out")
-
-        signal.signal(signal.SIGALRM, signal_handler)
-        signal.alarm(5)  # Таймаут 5 секунд
-        audio = AudioSegment.from_ogg(voice_file)
-        audio.export('voice.wav', format='wav')
-        with sr.AudioFile('voice.wav') as source:
-            audio_data = recognizer.record(source)
+        # PCM 16 кГц моно сразу в памяти, без WAV-файла
+        audio_data = sr.AudioData(decode_voice(voice_data), SAMPLE_RATE, SAMPLE_WIDTH)
         text = recognizer.recognize_google(audio_data, language='ru-RU')
         return text
     except (sr.UnknownValueError, sr.RequestError, TimeoutError, Exception) as e:
         logger.error(f"Ошибка распознавания голоса: {e}\n{traceback.format_exc()}")
         return None
-    finally:
-        signal.alarm(0)
-        if os.path.exists('voice.wav'):
-            os.remove('voice.wav')
 
 
-# Текст в голос
-def text_to_voice(text):
+# Синтез одного предложения в MP3 в памяти
+def synthesize_sentence(sentence):
+    mp3 = io.BytesIO()
+    gTTS(text=sentence, lang='ru').write_to_fp(mp3)
+    return mp3.getvalue()
+
+
+# Под нагрузочным тестом Google STT и gTTS заменяются локальной заглушкой; переменная окружения
+# наследуется всеми процессами, включая воркеры, перезапущенные через spawn
+if os.getenv('LOAD_TEST_SPEECH_URL'):
+    from speech_stub import voice_to_text, synthesize_sentence
+
+
+# Текст в голос: предложения синтезируются параллельно и склеиваются в OGG/Opus
+async def text_to_voice(text):
     if not text:
         return None
+    sentences = [sentence.text for sentence in sentenize(text)] or [text]
     try:
-        tts = gTTS(text=text, lang='ru')
-        voice_file = 'response.mp3'
-        tts.save(voice_file)
-        return voice_file
+        chunks = await asyncio.gather(*(asyncio.to_thread(synthesize_sentence, s) for s in sentences))
     except Exception as e:
         logger.error(f"Ошибка синтеза речи: {e}\n{traceback.format_exc()}")
         return None
+    try:
+        return await asyncio.to_thread(encode_voice, chunks)
+    except Exception as e:
+        # Без Opus отправляем MP3, как раньше
+        logger.error(f"Ошибка кодирования голоса в Opus: {e}\n{traceback.format_exc()}")
+        return b''.join(chunks)
+
+
+# Общий экземпляр бота: модели загружаются один раз на процесс
+def get_bot(context):
+    bot = context.bot_data.get('bot')
+    if bot is None:
+        bot = context.bot_data['bot'] = Bot()
+    return bot
+
+
+# Профилировщик процесса, включается командой /profile
+PROFILER = MessageProfiler(CONFIG['profiling']['dir'], CONFIG['profiling']['top'])
+
+
+# Отправка через очередь исходящих сообщений, если она запущена
+async def send(context, chat_id, request):
+    outbound = context.bot_data.get('outbound')
+    if outbound is None:
+        await request()
+    elif not outbound.send(chat_id, request):
+        # Очередь отправки переполнена: ответ теряется, это должно быть видно в логах
+        logger.warning(f"Очередь отправки переполнена, ответ в чат {chat_id} не отправлен")
+
+
+# Ответ на сообщение пользователя: текстом или голосом
+async def reply(update, context, text=None, voice=None):
+    message = update.message
+    if voice is not None:
+        await send(context, message.chat_id, lambda: message.reply_voice(voice))
+    else:
+        await send(context, message.chat_id, lambda: message.reply_text(text))
 
 
 # Telegram-обработчики
@@ -490,14 +694,14 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     answer = CONFIG['start_message']
     context.user_data['last_bot_response'] = answer
     context.user_data['last_intent'] = Intent.HELLO.value
-    await update.message.reply_text(answer)
+    await reply(update, context, answer)
 
 
 async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     answer = CONFIG['help_message']
     context.user_data['last_bot_response'] = answer
     context.user_data['last_intent'] = 'help'
-    await update.message.reply_text(answer)
+    await reply(update, context, answer)
 
 
 async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -509,7 +713,40 @@ async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         f"Ответов из диалогов: {stats[ResponseType.GENERATE.value]}\n"
         f"Неудачных запросов: {stats[ResponseType.FAILURE.value]}"
     )
-    await update.message.reply_text(answer)
+    await reply(update, context, answer)
+
+
+async def profile_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if update.effective_user.id not in ADMIN_IDS:
+        await reply(update, context, "Команда доступна только администраторам.")
+        return
+    try:
+        count = int(context.args[0]) if context.args else CONFIG['profiling']['default_messages']
+    except ValueError:
+        await reply(update, context, "Использование: /profile N")
+        return
+    count = max(1, min(count, CONFIG['profiling']['max_messages']))
+    PROFILER.start(count, update.effective_chat.id)
+    await reply(update, context, f"Профилирую обработку следующих {count} сообщений.")
+
+
+# Обработка реплики с профилированием, если оно включено
+async def process_replica(context, text, budget=None):
+    answer, report = PROFILER.profile(get_bot(context).process, text, context, budget)
+    if report:
+        await send(context, PROFILER.chat_id, lambda: context.bot.send_message(PROFILER.chat_id, report))
+    return answer
+
+
+# Постановка сообщения в очередь допуска
+async def admit(update, context, priority, job):
+    admission = context.bot_data.get('admission')
+    if admission is None:
+        await job()
+        return
+    user = update.effective_user or update.effective_chat
+    if not admission.submit(user.id, priority, job) and admission.should_notify(user.id):
+        await reply(update, context, "Слишком много сообщений, подождите немного.")
 
 
 async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -517,52 +754,121 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not user_text:
         answer = "Пожалуйста, отправьте текст."
         context.user_data['last_bot_response'] = answer
-        await update.message.reply_text(answer)
+        await reply(update, context, answer)
         return
-    bot = context.bot_data.setdefault('bot', Bot())
-    answer = bot.process(user_text, context)
-    await update.message.reply_text(answer)
+    await admit(update, context, TEXT_PRIORITY, lambda: answer_text(update, context, user_text))
+
+
+async def answer_text(update, context, user_text):
+    answer = await process_replica(context, user_text)
+    await reply(update, context, answer)
 
 
 async def handle_voice(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    await admit(update, context, VOICE_PRIORITY, lambda: answer_voice(update, context))
+
+
+async def answer_voice(update, context):
     voice = update.message.voice
-    bot = context.bot_data.setdefault('bot', Bot())
+    # Отсчёт начинается до загрузки и распознавания, а не после них
+    budget = get_bot(context).start_budget(context, voice=True)
     try:
         voice_file = await context.bot.get_file(voice.file_id)
-        await voice_file.download_to_drive('voice.ogg')
-        text = voice_to_text('voice.ogg')
+        voice_data = bytes(await voice_file.download_as_bytearray())
+        text = await asyncio.to_thread(voice_to_text, voice_data)
         if text:
-            answer = bot.process(text, context)
-            voice_response = text_to_voice(answer)
+            answer = await process_replica(context, text, budget)
+            # Синтез речи — самый дорогой этап; при перегрузке отвечаем текстом
+            voice_response = None if budget.over_budget('voice_reply') else await text_to_voice(answer)
             if voice_response:
-                with open(voice_response, 'rb') as audio:
-                    await update.message.reply_voice(audio)
-                os.remove(voice_response)
+                await reply(update, context, voice=voice_response)
             else:
-                await update.message.reply_text(answer)
+                await reply(update, context, answer)
         else:
             answer = "Не удалось распознать голос. Попробуйте ещё раз."
             context.user_data['last_bot_response'] = answer
-            await update.message.reply_text(answer)
+            await reply(update, context, answer)
     except Exception as e:
         logger.error(f"Ошибка обработки голосового сообщения: {e}\n{traceback.format_exc()}")
         answer = "Произошла ошибка. Попробуйте снова."
         context.user_data['last_bot_response'] = answer
-        await update.message.reply_text(answer)
-    finally:
-        if os.path.exists('voice.ogg'):
-            os.remove('voice.ogg')
-
-
-def run_bot():
-    if not TOKEN:
-        raise ValueError("TELEGRAM_TOKEN не найден")
-    app = ApplicationBuilder().token(TOKEN).build()
+        await reply(update, context, answer)
+
+
+def application_builder(token):
+    builder = ApplicationBuilder().token(token)
+    if TELEGRAM_API_URL:
+        builder = builder.base_url(TELEGRAM_API_URL)
+    if TELEGRAM_FILE_URL:
+        builder = builder.base_file_url(TELEGRAM_FILE_URL)
+    return builder
+
+
+async def start_services(app):
+    admission = AdmissionController(**CONFIG['admission'])
+    await admission.start()
+    app.bot_data['admission'] = admission
+    # Лимит Telegram общий на бота: воркеры делят его поровну
+    settings = dict(CONFIG['outbound'])
+    settings['global_rate'] /= BOT_WORKERS
+    app.bot_data['outbound'] = OutboundDispatcher(**settings)
+
+
+async def stop_services(app):
+    admission = app.bot_data.pop('admission', None)
+    if admission:
+        await admission.stop()
+    # Очередь отправки останавливается последней: в неё пишут ответы уже принятых сообщений
+    outbound = app.bot_data.pop('outbound', None)
+    if outbound:
+        await outbound.stop()
+
+
+def build_application(token, updater=True):
+    builder = application_builder(token).post_init(start_services).post_stop(stop_services)
+    if not updater:
+        builder = builder.updater(None)
+    app = builder.build()
     app.add_handler(CommandHandler("start", start_command))
     app.add_handler(CommandHandler("help", help_command))
     app.add_handler(CommandHandler("stats", stats_command))
+    app.add_handler(CommandHandler("profile", profile_command))
     app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
     app.add_handler(MessageHandler(filters.VOICE, handle_voice))
+    return app
+
+
+def run_bot():
+    if not TOKEN:
+        raise ValueError("TELEGRAM_TOKEN не найден")
+    extra_health = None
+    if BOT_WORKERS > 1:
+        from preload import preload
+        from sharding import ShardedDispatcher
+        # Модели загружаются до fork, воркеры получают их через copy-on-write
+        dispatcher = ShardedDispatcher(TOKEN, application_builder, build_application, preload(Bot), BOT_WORKERS, Bot)
+        dispatcher.start_workers()
+        app = dispatcher.build_front()
+        extra_health = dispatcher.health
+    else:
+        app = build_application(TOKEN)
+
+        def extra_health():
+            admission = app.bot_data.get('admission')
+            bot = app.bot_data.get('bot')
+            outbound = app.bot_data.get('outbound')
+            return {'admission': admission.snapshot() if admission else {},
+                    'outbound': outbound.snapshot() if outbound else {},
+                    'dialogue_cache': bot.dialogue_cache.stats() if bot else {},
+                    'degradations': dict(bot.degradations) if bot else {}}
+    if BOT_MODE == 'webhook':
+        if not WEBHOOK_URL:
+            raise ValueError("WEBHOOK_URL не найден")
+        from webhook import WebhookServer
+        logger.info("Бот запускается в режиме webhook...")
+        WebhookServer(app, WEBHOOK_URL, WEBHOOK_LISTEN, WEBHOOK_PORT, WEBHOOK_PATH, WEBHOOK_SECRET,
+                      extra_health=extra_health).run()
+        return
     logger.info("Бот запускается...")
     app.run_polling()
 
@@ -0,0 +1,37 @@
+# ./app/build_catalog.py
+
+import csv
+import os
+import sys
+from data.config import CONFIG
+from catalog import build_catalog_store
+from utils import logger
+
+
+# Чтение каталога из CSV: списки через '|', синонимы категорий как 'категория:синоним,синоним'
+def load_toys_csv(path):
+    toys = {}
+    with open(path, encoding='utf-8', newline='') as f:
+        for row in csv.DictReader(f):
+            category_synonyms = {}
+            for item in filter(None, row.get('category_synonyms', '').split('|')):
+                category, _, synonyms = item.partition(':')
+                category_synonyms[category] = [s for s in synonyms.split(',') if s]
+            toys[row['name']] = {
+                'price': int(row['price']),
+                'age': {'min_age': int(row['min_age']), 'max_age': int(row['max_age']) if row['max_age'] else None},
+                'description': row.get('description') or 'интересная игрушка',
+                'synonyms': [s for s in row.get('synonyms', '').split('|') if s],
+                'categories': [c for c in row.get('categories', '').split('|') if c],
+                'category_synonyms': category_synonyms,
+            }
+    return toys
+
+
+if __name__ == '__main__':
+    source = sys.argv[1] if len(sys.argv) > 1 else None
+    toys = load_toys_csv(source) if source else CONFIG['toys']
+    path = CONFIG['catalog']['path']
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    build_catalog_store(toys, path)
+    logger.info(f"Каталог из {len(toys)} игрушек сохранён в {path}")
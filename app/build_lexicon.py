@@ -0,0 +1,14 @@
+# ./app/build_lexicon.py
+
+import os
+from data.config import CONFIG
+from sentiment import SentimentLexicon
+from utils import logger
+
+if __name__ == '__main__':
+    source = CONFIG['sentiment']['source']
+    path = CONFIG['sentiment']['path']
+    lexicon = SentimentLexicon.load(source)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    lexicon.save(path)
+    logger.info(f"Тональный словарь из {len(lexicon)} записей сохранён в {path}")
@@ -0,0 +1,332 @@
+# ./app/catalog.py
+
+import json
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+import numpy as np
+from data.config import CONFIG
+from templates import toy_fragments
+
+
+# Границы возраста для фильтра: (от, до) целыми числами или (None, None), если возраст не число
+def age_bounds(age, age_max=None):
+    try:
+        age = int(age)
+        age_max = int(age_max) if age_max else age
+    except (ValueError, TypeError):
+        return None, None
+    return min(age, age_max), max(age, age_max)
+
+
+# Массивы цен и возрастов и списки игрушек по категориям: фильтр — несколько векторных операций
+class FilterIndex:
+    """Строится и для CatalogIndex, и для CatalogStore; postings — {категория: [позиции игрушек в names]}."""
+
+    def __init__(self, names, prices, min_ages, max_ages, postings):
+        self.names = names
+        self.prices = np.array(prices, dtype=np.float64)
+        self.min_ages = np.array(min_ages, dtype=np.float64)
+        self.max_ages = np.array([np.inf if max_age is None else max_age for max_age in max_ages], dtype=np.float64)
+        self.category_ids = {category: np.array(ids, dtype=np.int32) for category, ids in postings.items()}
+
+    def filter(self, age=None, price=None, category=None, min_price=None, age_max=None):
+        """Игрушки, подходящие по возрасту (или диапазону age–age_max), диапазону цены и категории."""
+        mask = np.ones(len(self.names), dtype=bool)
+        if age:
+            age, age_max = age_bounds(age, age_max)
+            if age is None:
+                return []
+            mask &= (self.min_ages <= age_max) & (self.max_ages >= age)
+        if price:
+            mask &= self.prices <= price
+        if min_price:
+            mask &= self.prices >= min_price
+        if category:
+            category_mask = np.zeros(len(self.names), dtype=bool)
+            category_mask[self.category_ids.get(category, np.empty(0, dtype=np.int32))] = True
+            mask &= category_mask
+        return [self.names[i] for i in np.flatnonzero(mask)]
+
+
+# Индекс каталога для фильтрации векторными операциями
+class CatalogIndex:
+    """Массивы цен и возрастов, списки игрушек по категориям и фрагменты ответов, строится один раз."""
+
+    def __init__(self, toys):
+        self.toys = toys
+        self.names = list(toys.keys())
+        postings = {}
+        for toy_id, data in enumerate(toys.values()):
+            for category in data.get('categories', []):
+                postings.setdefault(category, []).append(toy_id)
+        self.filter_index = FilterIndex(self.names, [data['price'] for data in toys.values()],
+                                        [data['age']['min_age'] for data in toys.values()],
+                                        [data['age']['max_age'] for data in toys.values()], postings)
+        self.category_toys = {category: [self.names[i] for i in ids] for category, ids in postings.items()}
+        # Плоский список категорий с повторами, как для random.sample в TOY_TYPES
+        self.categories_flat = [category for data in toys.values() for category in data.get('categories', [])]
+        self.toy_fragments = {name: toy_fragments(name, data) for name, data in toys.items()}
+        self.match_entries = match_entries(toys.items())
+        # Индекс не перезагружается, версия нужна для кэшей, построенных поверх каталога
+        self.version = 0
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, toy_name):
+        return toy_name in self.toys
+
+    def get(self, toy_name):
+        return self.toys.get(toy_name)
+
+    def items(self):
+        return self.toys.items()
+
+    def fragments(self, toy_name):
+        return self.toy_fragments.get(toy_name)
+
+    def toys_in_category(self, category):
+        return self.category_toys.get(category, [])
+
+    def filter(self, age=None, price=None, category=None, min_price=None, age_max=None):
+        return self.filter_index.filter(age, price, category, min_price, age_max)
+
+
+# Данные для поиска игрушки и категории в реплике: (название, синонимы, категории, синонимы категорий)
+def match_entries(items):
+    return [(name, data.get('synonyms', []), data.get('categories', []), data.get('category_synonyms', {}))
+            for name, data in items]
+
+
+SCHEMA = """
+CREATE TABLE toys (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    price INTEGER NOT NULL,
+    min_age INTEGER NOT NULL,
+    max_age INTEGER,
+    description TEXT,
+    synonyms TEXT NOT NULL,
+    category_synonyms TEXT NOT NULL
+);
+CREATE TABLE toy_categories (
+    toy_id INTEGER NOT NULL REFERENCES toys (id),
+    category TEXT NOT NULL
+);
+CREATE INDEX idx_toys_price ON toys (price);
+CREATE INDEX idx_toys_age ON toys (min_age, max_age);
+CREATE INDEX idx_toy_categories_category ON toy_categories (category, toy_id);
+"""
+
+
+# Сборка SQLite-каталога из словаря в формате CONFIG['toys']
+def build_catalog_store(toys, path):
+    """Каталог собирается во временный файл и подменяет старый атомарно: работающий бот читает целую базу."""
+    tmp_path = f"{path}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.executescript(SCHEMA)
+        for toy_id, (name, data) in enumerate(toys.items()):
+            conn.execute(
+                "INSERT INTO toys VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (toy_id, name, data['price'], data['age']['min_age'], data['age']['max_age'],
+                 data.get('description'), json.dumps(data.get('synonyms', []), ensure_ascii=False),
+                 json.dumps(data.get('category_synonyms', {}), ensure_ascii=False)))
+            conn.executemany("INSERT INTO toy_categories VALUES (?, ?)",
+                             [(toy_id, category) for category in data.get('categories', [])])
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(tmp_path, path)
+
+
+# Каталог в SQLite: данные читаются по запросу, горячие игрушки держатся в памяти
+class CatalogStore:
+    """Те же методы, что у CatalogIndex, но данные лежат в SQLite с индексами; фильтр идёт по массивам FilterIndex,
+    собранным из базы при первом обращении.
+    Пересобранный файл замечается не чаще раза в check_interval секунд: кэши сбрасываются, version растёт."""
+
+    def __init__(self, path, hot_set_size=1000, check_interval=30):
+        self.path = path
+        self.hot_set_size = hot_set_size
+        self.check_interval = check_interval
+        self.hot_set = OrderedDict()
+        self.hot_fragments = OrderedDict()
+        self._version = 0
+        self._conn = None
+        self._pid = None
+        self._file_id = None
+        self._checked = 0.0
+        self._names = None
+        self._categories_flat = None
+        self._match_entries = None
+        self._filter_index = None
+
+    @property
+    def conn(self):
+        self._check_reload()
+        # После fork соединение открывается заново в каждом процессе
+        if self._conn is None or self._pid != os.getpid():
+            self._file_id = self._stat_file()
+            self._conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+            self._pid = os.getpid()
+        return self._conn
+
+    def _stat_file(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+    def _check_reload(self):
+        now = time.monotonic()
+        if self._conn is None or now - self._checked < self.check_interval:
+            return
+        self._checked = now
+        file_id = self._stat_file()
+        if file_id is None or file_id == self._file_id:
+            return
+        # build_catalog.py подменил файл: старое соединение видит удалённую копию
+        self._conn.close()
+        self._conn = None
+        self.hot_set.clear()
+        self.hot_fragments.clear()
+        self._names = None
+        self._categories_flat = None
+        self._match_entries = None
+        self._filter_index = None
+        self._version += 1
+
+    # Кэши ниже отдают данные без запроса к базе, поэтому пересборку файла проверяет каждый из них
+    @property
+    def version(self):
+        self._check_reload()
+        return self._version
+
+    @property
+    def names(self):
+        self._check_reload()
+        if self._names is None:
+            self._names = [row[0] for row in self.conn.execute("SELECT name FROM toys ORDER BY id")]
+        return self._names
+
+    @property
+    def categories_flat(self):
+        self._check_reload()
+        if self._categories_flat is None:
+            self._categories_flat = [row[0] for row in self.conn.execute(
+                "SELECT category FROM toy_categories ORDER BY toy_id, rowid")]
+        return self._categories_flat
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, toy_name):
+        return self.get(toy_name) is not None
+
+    @property
+    def match_entries(self):
+        self._check_reload()
+        if self._match_entries is None:
+            categories = self._categories_by_toy()
+            self._match_entries = [
+                (name, json.loads(synonyms), categories.get(toy_id, []), json.loads(category_synonyms))
+                for toy_id, name, synonyms, category_synonyms in self.conn.execute(
+                    "SELECT id, name, synonyms, category_synonyms FROM toys ORDER BY id")]
+        return self._match_entries
+
+    # Категории всех игрушек одним запросом
+    def _categories_by_toy(self):
+        categories = {}
+        for toy_id, category in self.conn.execute(
+                "SELECT toy_id, category FROM toy_categories ORDER BY toy_id, rowid"):
+            categories.setdefault(toy_id, []).append(category)
+        return categories
+
+    def _row_to_toy(self, row, categories=None):
+        toy_id, name, price, min_age, max_age, description, synonyms, category_synonyms = row
+        if categories is None:
+            categories = [r[0] for r in self.conn.execute(
+                "SELECT category FROM toy_categories WHERE toy_id = ? ORDER BY rowid", (toy_id,))]
+        toy = {
+            'price': price,
+            'age': {'min_age': min_age, 'max_age': max_age},
+            'synonyms': json.loads(synonyms),
+            'categories': categories,
+            'category_synonyms': json.loads(category_synonyms),
+        }
+        if description is not None:
+            toy['description'] = description
+        return name, toy
+
+    def get(self, toy_name):
+        self._check_reload()
+        if toy_name in self.hot_set:
+            self.hot_set.move_to_end(toy_name)
+            return self.hot_set[toy_name]
+        row = self.conn.execute("SELECT * FROM toys WHERE name = ?", (toy_name,)).fetchone()
+        if row is None:
+            return None
+        _, toy = self._row_to_toy(row)
+        self.hot_set[toy_name] = toy
+        if len(self.hot_set) > self.hot_set_size:
+            self.hot_set.popitem(last=False)
+        return toy
+
+    # Фрагменты ответов считаются при первом обращении и кэшируются так же, как горячие игрушки
+    def fragments(self, toy_name):
+        self._check_reload()
+        if toy_name in self.hot_fragments:
+            self.hot_fragments.move_to_end(toy_name)
+            return self.hot_fragments[toy_name]
+        toy = self.get(toy_name)
+        if toy is None:
+            return None
+        fragments = self.hot_fragments[toy_name] = toy_fragments(toy_name, toy)
+        if len(self.hot_fragments) > self.hot_set_size:
+            self.hot_fragments.popitem(last=False)
+        return fragments
+
+    def items(self):
+        categories = self._categories_by_toy()
+        for row in self.conn.execute("SELECT * FROM toys ORDER BY id").fetchall():
+            yield self._row_to_toy(row, categories.get(row[0], []))
+
+    def toys_in_category(self, category):
+        return [row[0] for row in self.conn.execute(
+            "SELECT t.name FROM toy_categories c JOIN toys t ON t.id = c.toy_id "
+            "WHERE c.category = ? ORDER BY t.id", (category,))]
+
+    # Массивы для фильтра собираются из базы один раз (и заново после пересборки файла)
+    @property
+    def filter_index(self):
+        self._check_reload()
+        if self._filter_index is None:
+            rows = self.conn.execute("SELECT id, name, price, min_age, max_age FROM toys ORDER BY id").fetchall()
+            positions = {row[0]: i for i, row in enumerate(rows)}
+            postings = {}
+            for toy_id, category in self.conn.execute(
+                    "SELECT toy_id, category FROM toy_categories ORDER BY toy_id, rowid"):
+                postings.setdefault(category, []).append(positions[toy_id])
+            _, names, prices, min_ages, max_ages = zip(*rows) if rows else ((),) * 5
+            self._filter_index = FilterIndex(list(names), prices, min_ages, max_ages, postings)
+        return self._filter_index
+
+    def filter(self, age=None, price=None, category=None, min_price=None, age_max=None):
+        return self.filter_index.filter(age, price, category, min_price, age_max)
+
+
+# Каталог из SQLite, если он собран, иначе индекс по CONFIG['toys']
+def load_catalog():
+    path = CONFIG['catalog']['path']
+    if os.path.exists(path):
+        return CatalogStore(path, CONFIG['catalog']['hot_set_size'], CONFIG['catalog']['check_interval'])
+    return CatalogIndex(CONFIG['toys'])
+
+
+CATALOG = load_catalog()
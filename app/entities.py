@@ -0,0 +1,182 @@
+# ./app/entities.py
+
+import logging
+import re
+from utils import clear_phrase
+
+extract_logger = logging.getLogger('entities')
+
+TOKEN_RE = re.compile(r'\d+|[a-zа-я]+|-')
+
+# Числительные во всех нужных формах (ё заменяется на е до поиска)
+UNITS = {
+    'ноль': 0, 'один': 1, 'одна': 1, 'одно': 1, 'одного': 1, 'одной': 1, 'одну': 1, 'одному': 1,
+    'два': 2, 'две': 2, 'двух': 2, 'двум': 2, 'три': 3, 'трех': 3, 'трем': 3,
+    'четыре': 4, 'четырех': 4, 'четырем': 4, 'пять': 5, 'пяти': 5, 'шесть': 6, 'шести': 6,
+    'семь': 7, 'семи': 7, 'восемь': 8, 'восьми': 8, 'девять': 9, 'девяти': 9,
+    'десять': 10, 'десяти': 10, 'одиннадцать': 11, 'одиннадцати': 11, 'двенадцать': 12, 'двенадцати': 12,
+    'тринадцать': 13, 'тринадцати': 13, 'четырнадцать': 14, 'четырнадцати': 14,
+    'пятнадцать': 15, 'пятнадцати': 15, 'шестнадцать': 16, 'шестнадцати': 16,
+    'семнадцать': 17, 'семнадцати': 17, 'восемнадцать': 18, 'восемнадцати': 18,
+    'девятнадцать': 19, 'девятнадцати': 19,
+}
+TENS = {
+    'двадцать': 20, 'двадцати': 20, 'тридцать': 30, 'тридцати': 30, 'сорок': 40, 'сорока': 40,
+    'пятьдесят': 50, 'пятидесяти': 50, 'шестьдесят': 60, 'шестидесяти': 60,
+    'семьдесят': 70, 'семидесяти': 70, 'восемьдесят': 80, 'восьмидесяти': 80,
+    'девяносто': 90, 'девяноста': 90,
+}
+HUNDREDS = {
+    'сто': 100, 'ста': 100, 'двести': 200, 'двухсот': 200, 'триста': 300, 'трехсот': 300,
+    'четыреста': 400, 'четырехсот': 400, 'пятьсот': 500, 'пятисот': 500, 'шестьсот': 600, 'шестисот': 600,
+    'семьсот': 700, 'семисот': 700, 'восемьсот': 800, 'восьмисот': 800, 'девятьсот': 900, 'девятисот': 900,
+}
+THOUSANDS = {'тысяча', 'тысячи', 'тысяч', 'тысячу', 'тысячей', 'тыс', 'к', 'k'}
+# Составные прилагательные: «пятилетний», «трехлетнему»
+COMPOUND_AGE_RE = re.compile(r'(одно|двух|трех|четырех|пяти|шести|семи|восьми|девяти|десяти|'
+                             r'одиннадцати|двенадцати)летн[а-я]*')
+COMPOUND_STEMS = {'одно': 1, 'двух': 2, 'трех': 3, 'четырех': 4, 'пяти': 5, 'шести': 6, 'семи': 7,
+                  'восьми': 8, 'девяти': 9, 'десяти': 10, 'одиннадцати': 11, 'двенадцати': 12}
+
+AGE_UNITS = {'год', 'года', 'лет', 'годик', 'годика', 'годиков', 'годам', 'годиком', 'летний', 'летнего',
+             'летней', 'летнему', 'летняя', 'летнюю', 'летнем', 'летних'}
+PRICE_UNITS = {'рублей', 'рубля', 'рубль', 'руб', 'р', 'rub'}
+AGE_TRIGGERS = {'для', 'возраст', 'возраста', 'возрасту', 'ребенку', 'малышу'}
+PRICE_TRIGGERS = {'до', 'дешевле', 'за', 'бюджет', 'стоимостью', 'ценой', 'цена'}
+# Слова, после которых «голое» число ещё может относиться к возрасту или цене
+FREE_FOLLOWERS = {'и', 'или', 'до', 'от', 'по', 'включительно', 'а', 'но', 'для', 'дешевле', '-'}
+RANGE_CONNECTORS = {'до', '-'}
+# Верхняя граница диапазона больше этого — не возраст: «от 500 до 1000» без единицы читается как цена
+MAX_AGE = 18
+
+
+# Возраст и цена из реплики
+class Entities:
+    """age/age_max — возраст (для диапазона «от 3 до 5 лет» — границы), price — верхняя граница цены,
+    price_min — нижняя («от 500»)."""
+
+    __slots__ = ('age', 'age_max', 'price', 'price_min')
+
+    def __init__(self, age=None, age_max=None, price=None, price_min=None):
+        self.age = age
+        self.age_max = age_max
+        self.price = price
+        self.price_min = price_min
+
+    def __repr__(self):
+        return f"Entities(age={self.age}, age_max={self.age_max}, price={self.price}, price_min={self.price_min})"
+
+
+# Число, начинающееся с токена i: (значение, индекс следующего токена) или None
+def _parse_number(tokens, i):
+    total = 0
+    current = 0
+    start = i
+    while i < len(tokens):
+        token = tokens[i][0]
+        if token.isdigit():
+            # Разряды через пробел: «1 000»
+            if i == start + 1 and len(token) == 3 and tokens[start][0].isdigit() and total == 0:
+                current = current * 1000 + int(token)
+            elif i != start:
+                break
+            else:
+                current = int(token)
+        elif token in UNITS and (current % 100 == 0 or current % 10 == 0 and current % 100 >= 20
+                                 and UNITS[token] < 10):
+            current += UNITS[token]
+        elif token in TENS and current % 100 == 0:
+            current += TENS[token]
+        elif token in HUNDREDS and current == 0:
+            current += HUNDREDS[token]
+        elif token in THOUSANDS and total == 0:
+            # «к»/«k» — тысячи только вплотную к цифрам («5к»), иначе это предлог или опечатка
+            if token in ('к', 'k') and not (i > start and tokens[i - 1][0].isdigit()
+                                             and tokens[i - 1][2] == tokens[i][1]):
+                break
+            if i == start and not token.startswith('тыс'):
+                break
+            total = (current or 1) * 1000
+            current = 0
+        else:
+            break
+        i += 1
+    if i == start:
+        return None
+    return total + current, i
+
+
+# Единица после числа ('age'/'price') или None; дефис перед словом пропускается («5-летнего»)
+def _unit_after(tokens, i):
+    if i + 1 < len(tokens) and tokens[i][0] == '-' and not tokens[i + 1][0].isdigit():
+        i += 1
+    if i >= len(tokens):
+        return None
+    token = tokens[i][0]
+    if token in AGE_UNITS:
+        return 'age'
+    if token in PRICE_UNITS:
+        return 'price'
+    return None
+
+
+# Тип «голого» числа по последнему предлогу-подсказке; число перед другим словом («1000 элементов») не считается
+def _kind_by_trigger(tokens, end, trigger):
+    if end < len(tokens) and tokens[end][0] not in FREE_FOLLOWERS:
+        return None
+    return trigger
+
+
+# Все сущности за один проход по очищенной фразе
+def extract_entities(replica):
+    text = clear_phrase(replica).replace('ё', 'е')
+    tokens = [(m.group(), m.start(), m.end()) for m in TOKEN_RE.finditer(text)]
+    entities = Entities()
+    trigger = None
+    i = 0
+    while i < len(tokens):
+        token = tokens[i][0]
+        compound = COMPOUND_AGE_RE.fullmatch(token)
+        if compound:
+            if entities.age is None:
+                entities.age = COMPOUND_STEMS[compound.group(1)]
+            i += 1
+            continue
+        parsed = _parse_number(tokens, i)
+        if parsed is None:
+            if token in AGE_TRIGGERS:
+                trigger = 'age'
+            elif token in PRICE_TRIGGERS:
+                trigger = 'price'
+            i += 1
+            continue
+        value, end = parsed
+        after_from = i > 0 and tokens[i - 1][0] == 'от'
+        unit = _unit_after(tokens, end)
+
+        # Диапазон «от X до Y» или «X-Y»: единица после второго числа относится к обоим
+        second = None
+        if unit is None and end + 1 < len(tokens) and tokens[end][0] in RANGE_CONNECTORS:
+            second = _parse_number(tokens, end + 1)
+        if second:
+            value_max, end = second
+            # Без единицы и подсказки диапазон считается ценой, если он не может быть возрастом;
+            # «от 3 до 5» неоднозначен и не угадывается
+            kind = (_unit_after(tokens, end) or _kind_by_trigger(tokens, end, trigger)
+                    or ('price' if value_max > MAX_AGE else None))
+            if kind == 'age' and entities.age is None:
+                entities.age, entities.age_max = value, value_max
+            elif kind == 'price' and entities.price is None:
+                entities.price_min, entities.price = value, value_max
+        else:
+            kind = unit or _kind_by_trigger(tokens, end, trigger)
+            if kind == 'age' and entities.age is None:
+                entities.age = value
+            elif kind == 'price' and after_from and entities.price_min is None:
+                entities.price_min = value
+            elif kind == 'price' and not after_from and entities.price is None:
+                entities.price = value
+        i = end
+    extract_logger.info("Entities in '%s': %s", text, entities)
+    return entities
+
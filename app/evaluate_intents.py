@@ -0,0 +1,180 @@
+# ./app/evaluate_intents.py
+
+import argparse
+import random
+import time
+from collections import Counter, defaultdict
+from sklearn.svm import LinearSVC
+from data.config import CONFIG
+from catalog import CATALOG
+from intent_model import CompiledIntentModel, compile_intent_model, fuzzy_examples, fuzzy_intent
+from tfidf import fit_tfidf
+from utils import lemmatize_many, lemmatize_phrase, lemmatize_fast, logger
+
+FOLDS = 5
+SEED = 42
+VARIANTS = ('held_out', 'typo', 'casing', 'order')
+BACKENDS = ('svm', 'compiled', 'fuzzy', 'hybrid', 'fallback')
+NO_INTENT = 'none'
+
+
+# Подстановка настоящих названий вместо [toy_name]: так пишут пользователи
+def fill_placeholders(phrase, rng):
+    while '[toy_name]' in phrase:
+        phrase = phrase.replace('[toy_name]', rng.choice(CATALOG.names), 1)
+    return phrase
+
+
+# Опечатка: перестановка, пропуск или удвоение буквы в одном из длинных слов
+def add_typo(phrase, rng):
+    words = phrase.split()
+    candidates = [i for i, word in enumerate(words) if len(word) > 3]
+    if not candidates:
+        return phrase
+    i = rng.choice(candidates)
+    word = words[i]
+    pos = rng.randrange(1, len(word) - 1)
+    kind = rng.choice(('swap', 'drop', 'double'))
+    if kind == 'swap':
+        word = word[:pos] + word[pos + 1] + word[pos] + word[pos + 2:]
+    elif kind == 'drop':
+        word = word[:pos] + word[pos + 1:]
+    else:
+        word = word[:pos] + word[pos] + word[pos:]
+    words[i] = word
+    return ' '.join(words)
+
+
+def change_casing(phrase, rng):
+    return rng.choice((str.upper, str.lower, str.title))(phrase)
+
+
+def shuffle_words(phrase, rng):
+    words = phrase.split()
+    rng.shuffle(words)
+    return ' '.join(words)
+
+
+# Варианты отложенного примера: исходный и искажённые
+def make_variants(example, rng):
+    phrase = fill_placeholders(example, rng)
+    return {
+        'held_out': phrase,
+        'typo': add_typo(phrase, rng),
+        'casing': change_casing(phrase, rng),
+        'order': shuffle_words(phrase, rng),
+    }
+
+
+# Стратифицированное разбиение: примеры каждого намерения поровну по фолдам
+def split_folds(folds, rng):
+    split = [[] for _ in range(folds)]
+    for intent, data in CONFIG['intents'].items():
+        examples = list(data['examples'])
+        rng.shuffle(examples)
+        for i, example in enumerate(examples):
+            split[i % folds].append((example, intent))
+    return split
+
+
+# Классификаторы, обученные на части примеров; каждый принимает сырую реплику
+def build_backends(train):
+    examples = [example for example, _ in train]
+    labels = [intent for _, intent in train]
+    vectorizer, X = fit_tfidf('intents', lemmatize_many(examples))
+    clf = LinearSVC()
+    clf.fit(X, labels)
+    compiled = CompiledIntentModel(**compile_intent_model(vectorizer, clf))
+    by_intent = defaultdict(list)
+    for example, intent in train:
+        by_intent[intent].append(example)
+    fuzzy = fuzzy_examples(by_intent, lemmatize_fast)
+    threshold = CONFIG['thresholds']['intent_score']
+
+    def svm_predict(replica):
+        lemmatized = lemmatize_phrase(replica)
+        return clf.predict(vectorizer.transform([lemmatized]))[0] if lemmatized else None
+
+    def compiled_predict(replica):
+        lemmatized = lemmatize_phrase(replica)
+        return compiled.predict(lemmatized) if lemmatized else None
+
+    def fuzzy_predict(replica):
+        return fuzzy_intent(lemmatize_fast(replica), fuzzy, threshold)[0]
+
+    # Как Bot.classify_intent: ответ есть, только если нечёткий поиск прошёл порог
+    def hybrid_predict(replica):
+        intent = compiled_predict(replica)
+        best_intent, best_score = fuzzy_intent(lemmatize_fast(replica), fuzzy, threshold)
+        return best_intent or intent if best_score >= threshold else None
+
+    # Нечёткий поиск, а ниже порога — предсказание модели
+    def fallback_predict(replica):
+        return fuzzy_predict(replica) or compiled_predict(replica)
+
+    return {
+        'svm': svm_predict,
+        'compiled': compiled_predict,
+        'fuzzy': fuzzy_predict,
+        'hybrid': hybrid_predict,
+        'fallback': fallback_predict,
+    }
+
+
+def evaluate(folds, seed):
+    rng = random.Random(seed)
+    split = split_folds(folds, rng)
+    correct = Counter()
+    total = Counter()
+    elapsed = Counter()
+    confusion = defaultdict(Counter)
+    for fold in range(folds):
+        train = [pair for i, part in enumerate(split) if i != fold for pair in part]
+        backends = build_backends(train)
+        cases = [(variant, phrase, intent) for example, intent in split[fold]
+                 for variant, phrase in make_variants(example, rng).items()]
+        logger.info(f"Фолд {fold + 1}/{folds}: обучение на {len(train)}, проверка на {len(cases)} фразах")
+        for name, predict in backends.items():
+            for variant, phrase, intent in cases:
+                start = time.perf_counter()
+                predicted = predict(phrase) or NO_INTENT
+                elapsed[name] += time.perf_counter() - start
+                total[name, variant] += 1
+                correct[name, variant] += predicted == intent
+                confusion[name][intent, predicted] += 1
+    return correct, total, elapsed, confusion
+
+
+def print_accuracy(correct, total, elapsed):
+    print(f"{'классификатор':14s}" + ''.join(f"{variant:>10s}" for variant in VARIANTS)
+          + f"{'все':>10s}{'сообщ./с':>11s}")
+    for name in BACKENDS:
+        cells = [correct[name, variant] / max(total[name, variant], 1) for variant in VARIANTS]
+        all_correct = sum(correct[name, variant] for variant in VARIANTS)
+        all_total = sum(total[name, variant] for variant in VARIANTS)
+        print(f"{name:14s}" + ''.join(f"{cell:10.1%}" for cell in cells)
+              + f"{all_correct / max(all_total, 1):10.1%}{all_total / max(elapsed[name], 1e-9):11.0f}")
+
+
+# Матрица ошибок: строки — верное намерение, столбцы — предсказанное
+def print_confusion(name, confusion):
+    labels = list(CONFIG['intents']) + [NO_INTENT]
+    print(f"\n== {name}: строки — верное намерение, столбцы — предсказанное")
+    print(f"{'':22s}" + ''.join(f"{i:>4d}" for i in range(len(labels))))
+    for i, intent in enumerate(labels[:-1]):
+        row = ''.join(f"{confusion[intent, predicted] or '.':>4}" for predicted in labels)
+        print(f"{i:2d} {intent:19s}" + row)
+    print(f"{len(labels) - 1:2d} = {NO_INTENT} (намерение не распознано)")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Оценка классификаторов намерений на отложенных примерах")
+    parser.add_argument('--folds', type=int, default=FOLDS)
+    parser.add_argument('--seed', type=int, default=SEED)
+    parser.add_argument('--confusion', nargs='*', default=['hybrid'], choices=BACKENDS,
+                        help="для каких классификаторов печатать матрицу ошибок")
+    args = parser.parse_args()
+    correct, total, elapsed, confusion = evaluate(args.folds, args.seed)
+    print_accuracy(correct, total, elapsed)
+    for name in args.confusion:
+        print_confusion(name, confusion[name])
@@ -0,0 +1,70 @@
+# ./app/fingerprint.py
+
+import hashlib
+import json
+import logging
+import os
+import sys
+from importlib.metadata import version, PackageNotFoundError
+from data.config import CONFIG
+from log_pipeline import setup_logging
+
+# Без импорта utils: проверка отпечатка не должна ждать загрузки Natasha и sklearn
+setup_logging(CONFIG['logging']['level'], CONFIG['logging']['format'], CONFIG['logging']['sampling'])
+logger = logging.getLogger(__name__)
+
+MODELS_DIR = 'models'
+# Код и библиотеки, от которых зависят признаки и формат pickle; свой код модели тренер добавляет сам
+SOURCES = ('utils.py', 'tfidf.py')
+PACKAGES = ('scikit-learn', 'numpy', 'scipy', 'natasha', 'pymorphy2', 'pymorphy2-dicts-ru')
+
+
+def _package_version(name):
+    try:
+        return version(name)
+    except PackageNotFoundError:
+        return None
+
+
+# Отпечаток обучения: входные файлы, гиперпараметры, код и версии библиотек
+def training_fingerprint(script, params, files=(), sources=SOURCES):
+    digest = hashlib.sha256()
+    digest.update(json.dumps(params, sort_keys=True, ensure_ascii=False, default=str).encode())
+    environment = {'python': sys.version_info[:2], **{name: _package_version(name) for name in PACKAGES}}
+    digest.update(json.dumps(environment, sort_keys=True).encode())
+    app_dir = os.path.dirname(os.path.abspath(__file__))
+    for path in (script, *(os.path.join(app_dir, source) for source in sources), *files):
+        with open(path, 'rb') as f:
+            digest.update(hashlib.file_digest(f, 'sha256').digest())
+    return digest.hexdigest()
+
+
+def _fingerprint_path(name):
+    return os.path.join(MODELS_DIR, f"{name}.fingerprint")
+
+
+# Модель уже обучена на тех же данных и все её файлы на месте
+def is_up_to_date(name, fingerprint, artifacts):
+    if '--force' in sys.argv:
+        return False
+    try:
+        with open(_fingerprint_path(name), encoding='utf-8') as f:
+            saved = f.read().strip()
+    except FileNotFoundError:
+        return False
+    missing = [path for path in artifacts if not os.path.exists(path)]
+    if missing:
+        logger.info(f"Отпечаток {name} есть, но не хватает файлов: {missing}")
+        return False
+    if saved != fingerprint:
+        return False
+    logger.info(f"{name}: данные, параметры и код не менялись, обучение пропущено")
+    return True
+
+
+# Отпечаток записывается последним, после всех файлов модели
+def save_fingerprint(name, fingerprint):
+    path = _fingerprint_path(name)
+    with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+        f.write(fingerprint)
+    os.replace(f"{path}.tmp", path)
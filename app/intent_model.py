@@ -0,0 +1,126 @@
+# ./app/intent_model.py
+
+import pickle
+import re
+import numpy as np
+from rapidfuzz import process, fuzz
+
+
+# Компактная форма модели намерений
+def compile_intent_model(vectorizer, clf):
+    """Словарь, idf и веса LinearSVC в виде float32-массивов."""
+    coef = np.asarray(clf.coef_, dtype=np.float32)
+    intercept = np.asarray(clf.intercept_, dtype=np.float32)
+    return {
+        'vocabulary': {term: int(index) for term, index in vectorizer.vocabulary_.items()},
+        'idf': np.asarray(vectorizer.idf_, dtype=np.float32),
+        # Храним веса транспонированными: строка на признак, столбец на класс
+        'coef': np.ascontiguousarray(coef.T),
+        'intercept': intercept,
+        'classes': [str(c) for c in clf.classes_],
+        'ngram_range': tuple(vectorizer.ngram_range),
+        'token_pattern': vectorizer.token_pattern,
+        'lowercase': vectorizer.lowercase,
+        'norm': vectorizer.norm,
+        'sublinear_tf': vectorizer.sublinear_tf,
+    }
+
+
+# Экспорт компактной формы модели намерений
+def export_compiled_intent_model(vectorizer, clf, path):
+    """Сохраняет компактную форму модели в pickle."""
+    compiled = compile_intent_model(vectorizer, clf)
+    with open(path, 'wb') as f:
+        pickle.dump(compiled, f)
+    return compiled
+
+
+# Лёгкий инференс без sklearn
+class CompiledIntentModel:
+    """Повторяет TfidfVectorizer.transform + LinearSVC.predict для одной строки."""
+
+    def __init__(self, vocabulary, idf, coef, intercept, classes, ngram_range=(1, 1),
+                 token_pattern=r"(?u)\b\w\w+\b", lowercase=True, norm='l2', sublinear_tf=False):
+        self.vocabulary = vocabulary
+        self.idf = idf
+        self.coef = coef
+        self.intercept = intercept
+        self.classes = classes
+        self.min_n, self.max_n = ngram_range
+        self.token_re = re.compile(token_pattern)
+        self.lowercase = lowercase
+        self.norm = norm
+        self.sublinear_tf = sublinear_tf
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            return cls(**pickle.load(f))
+
+    def _tokens(self, text):
+        if self.lowercase:
+            text = text.lower()
+        tokens = self.token_re.findall(text)
+        if self.max_n == 1:
+            return tokens
+        ngrams = list(tokens) if self.min_n == 1 else []
+        for n in range(max(self.min_n, 2), self.max_n + 1):
+            for i in range(len(tokens) - n + 1):
+                ngrams.append(' '.join(tokens[i:i + n]))
+        return ngrams
+
+    def transform(self, text):
+        """Возвращает индексы и веса ненулевых TF-IDF признаков."""
+        counts = {}
+        vocabulary = self.vocabulary
+        for term in self._tokens(text):
+            index = vocabulary.get(term)
+            if index is not None:
+                counts[index] = counts.get(index, 0) + 1
+        indices = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        values = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+        if self.sublinear_tf:
+            values = np.log(values) + 1
+        values *= self.idf[indices]
+        if self.norm == 'l2':
+            norm = np.sqrt(np.dot(values, values))
+            if norm > 0:
+                values /= norm
+        elif self.norm == 'l1':
+            norm = np.abs(values).sum()
+            if norm > 0:
+                values /= norm
+        return indices, values
+
+    def decision_function(self, text):
+        indices, values = self.transform(text)
+        return values @ self.coef[indices] + self.intercept
+
+    def predict(self, text):
+        scores = self.decision_function(text)
+        if len(self.classes) == 2:
+            return self.classes[int(scores[0] > 0)]
+        return self.classes[int(scores.argmax())]
+
+
+# Лемматизированные примеры намерений для нечёткого поиска
+def fuzzy_examples(examples_by_intent, lemmatize):
+    result = {}
+    for intent, examples in examples_by_intent.items():
+        lemmatized = [lemmatize(example) for example in examples]
+        lemmatized = [example for example in lemmatized if example]
+        if lemmatized:
+            result[intent] = lemmatized
+    return result
+
+
+# Нечёткое совпадение с примерами: (намерение, оценка) или (None, 0) ниже порога
+def fuzzy_intent(replica, examples, threshold):
+    best_score = 0
+    best_intent = None
+    for intent, intent_examples in examples.items():
+        match = process.extractOne(replica, intent_examples, scorer=fuzz.ratio)
+        if match and match[1] / 100 > best_score and match[1] / 100 >= threshold:
+            best_score = match[1] / 100
+            best_intent = intent
+    return best_intent, best_score
@@ -0,0 +1,64 @@
+# ./app/lemmatizer_report.py
+
+import time
+from collections import Counter
+from data.config import CONFIG
+from utils import clear_many, lemmatize_many, logger
+
+DIALOGUES_LIMIT = 2000
+TOP_DISAGREEMENTS = 15
+
+
+# Загрузка вопросов из dialogues.txt
+def load_dialogue_questions(limit=DIALOGUES_LIMIT):
+    try:
+        with open('data/dialogues.txt', encoding='utf-8') as f:
+            content = f.read()
+    except FileNotFoundError:
+        logger.warning("Файл dialogues.txt не найден, отчёт только по intents")
+        return []
+    questions = [d.split('\n')[0] for d in content.split('\n\n') if len(d.split('\n')) >= 2]
+    return [q[1:].strip() if q.startswith('-') else q for q in questions[:limit]]
+
+
+# Сравнение лемматизаторов на наборе фраз
+def compare(name, phrases):
+    phrases = [p for p in clear_many(phrases) if p]
+    timings = {}
+    results = {}
+    for backend in ('natasha', 'pymorphy'):
+        start = time.perf_counter()
+        results[backend] = lemmatize_many(phrases, backend)
+        timings[backend] = (time.perf_counter() - start) / max(len(phrases), 1) * 1e3
+
+    phrase_agree = 0
+    tokens_total = 0
+    tokens_agree = 0
+    disagreements = Counter()
+    for natasha, pymorphy in zip(results['natasha'], results['pymorphy']):
+        phrase_agree += natasha == pymorphy
+        natasha_tokens, pymorphy_tokens = natasha.split(), pymorphy.split()
+        if len(natasha_tokens) != len(pymorphy_tokens):
+            continue
+        for a, b in zip(natasha_tokens, pymorphy_tokens):
+            tokens_total += 1
+            if a == b:
+                tokens_agree += 1
+            else:
+                disagreements[(a, b)] += 1
+
+    print(f"== {name}: {len(phrases)} фраз")
+    print(f"Совпадение фраз:  {phrase_agree / max(len(phrases), 1):.1%}")
+    print(f"Совпадение слов:  {tokens_agree / max(tokens_total, 1):.1%}")
+    print(f"natasha:  {timings['natasha']:.3f} мс/фраза")
+    print(f"pymorphy: {timings['pymorphy']:.3f} мс/фраза")
+    for (a, b), count in disagreements.most_common(TOP_DISAGREEMENTS):
+        print(f"  {count:4d}  natasha='{a}'  pymorphy='{b}'")
+
+
+if __name__ == '__main__':
+    examples = [ex for data in CONFIG['intents'].values() for ex in data['examples']]
+    compare('intents', examples)
+    questions = load_dialogue_questions()
+    if questions:
+        compare('dialogues.txt', questions)
@@ -0,0 +1,319 @@
+# ./app/load_test.py
+
+import argparse
+import email.parser
+import email.policy
+import io
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlparse
+from speech_stub import SPEECH_URL_ENV
+from utils import logger
+
+TOKEN = '123456:LOAD-TEST'
+BOT_USER = {'id': 123456, 'is_bot': True, 'first_name': 'ToyShop', 'username': 'toy_shop_load_test_bot'}
+
+# Ответы бота, которые считаются ошибкой, хотя и пришли вовремя
+ERROR_REPLIES = ('Произошла ошибка', 'Не удалось распознать голос', 'Слишком много сообщений')
+# Что «распознаёт» заглушка STT в любом голосовом сообщении
+STT_TEXT = 'Сколько стоит кукла барби?'
+
+# Сценарии диалогов: строка — текст, ('voice',) — голосовое сообщение
+SCRIPTS = [
+    ['Привет', 'Какие игрушки есть?', 'Сколько стоит кукла барби?', 'да', 'Пока'],
+    ['Нужна игрушка для 5 лет', 'Что есть до 1000 рублей?', 'мягкие игрушки', 'цена', 'нет'],
+    ['Как дела?', 'Что посоветуешь?', '7 лет', 'Пазл 500 элементов', 'описание'],
+    ['Привет', ('voice',), 'Сравни игрушки', 'да', ('voice',)],
+]
+
+
+# Локальная замена Telegram Bot API (getUpdates, sendMessage, sendVoice, getFile) и сервисов речи (/stt, /tts)
+class FakeTelegramServer:
+    def __init__(self, host='127.0.0.1', port=8081, voice_bytes=b'', tts_bytes=b''):
+        self.host = host
+        self.port = port
+        self.voice_bytes = voice_bytes
+        self.tts_bytes = tts_bytes
+        self.updates = []
+        self.condition = threading.Condition()
+        self.next_update_id = 1
+        self.next_message_id = 1
+        self.waiters = {}
+        self.lock = threading.Lock()
+        self.httpd = None
+
+    @property
+    def api_url(self):
+        return f"http://{self.host}:{self.port}/bot"
+
+    @property
+    def file_url(self):
+        return f"http://{self.host}:{self.port}/file/bot"
+
+    @property
+    def speech_url(self):
+        return f"http://{self.host}:{self.port}/speech"
+
+    def start(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                server.handle(self)
+
+            def do_POST(self):
+                server.handle(self)
+
+        self.httpd = ThreadingHTTPServer((self.host, self.port), Handler)
+        self.httpd.daemon_threads = True
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def stop(self):
+        if self.httpd:
+            self.httpd.shutdown()
+
+    def _message(self, chat_id, **fields):
+        with self.lock:
+            message_id = self.next_message_id
+            self.next_message_id += 1
+        return {
+            'message_id': message_id,
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private', 'first_name': f"user{chat_id}"},
+            'from': {'id': chat_id, 'is_bot': False, 'first_name': f"user{chat_id}"},
+            **fields,
+        }
+
+    def push(self, chat_id, text=None, voice=False):
+        """Кладёт входящее сообщение пользователя в очередь getUpdates и возвращает событие ответа."""
+        if voice:
+            message = self._message(chat_id, voice={
+                'file_id': f"voice-{chat_id}", 'file_unique_id': f"voice-{chat_id}",
+                'duration': 2, 'mime_type': 'audio/ogg'})
+        else:
+            message = self._message(chat_id, text=text)
+        waiter = {'event': threading.Event(), 'kind': None, 'text': None}
+        with self.lock:
+            self.waiters[chat_id] = waiter
+        with self.condition:
+            self.updates.append({'update_id': self.next_update_id, 'message': message})
+            self.next_update_id += 1
+            self.condition.notify_all()
+        return waiter
+
+    def _reply(self, chat_id, kind, text=None):
+        with self.lock:
+            waiter = self.waiters.pop(chat_id, None)
+        if waiter:
+            waiter['kind'] = kind
+            waiter['text'] = text
+            waiter['event'].set()
+
+    def _params(self, request):
+        query = dict(parse_qsl(urlparse(request.path).query))
+        length = int(request.headers.get('Content-Length') or 0)
+        body = request.rfile.read(length) if length else b''
+        content_type = request.headers.get('Content-Type', '')
+        if content_type.startswith('application/json'):
+            query.update(json.loads(body or b'{}'))
+        elif content_type.startswith('multipart/form-data'):
+            parser = email.parser.BytesParser(policy=email.policy.HTTP)
+            message = parser.parsebytes(f"Content-Type: {content_type}\r\n\r\n".encode() + body)
+            for part in message.iter_parts():
+                name = part.get_param('name', header='content-disposition')
+                payload = part.get_payload(decode=True)
+                query[name] = payload if part.get_filename() else payload.decode()
+        elif body:
+            query.update(parse_qsl(body.decode()))
+        return query
+
+    def _get_updates(self, params):
+        offset = int(params.get('offset') or 0)
+        timeout = float(params.get('timeout') or 0)
+        with self.condition:
+            self.updates = [u for u in self.updates if u['update_id'] >= offset]
+            if not self.updates and timeout:
+                self.condition.wait(timeout)
+            return self.updates[:100]
+
+    def handle(self, request):
+        path = urlparse(request.path).path
+        if path.startswith('/file/'):
+            return self._send(request, 200, self.voice_bytes, 'audio/ogg')
+        if path.startswith('/speech/'):
+            # Тело (PCM или текст) заглушкам не нужно, но его надо дочитать
+            request.rfile.read(int(request.headers.get('Content-Length') or 0))
+        if path == '/speech/stt':
+            return self._send(request, 200, STT_TEXT.encode(), 'text/plain; charset=utf-8')
+        if path == '/speech/tts':
+            return self._send(request, 200, self.tts_bytes, 'audio/mpeg')
+        method = path.rsplit('/', 1)[-1]
+        params = self._params(request)
+        if method == 'getMe':
+            result = BOT_USER
+        elif method == 'getUpdates':
+            result = self._get_updates(params)
+        elif method == 'sendMessage':
+            chat_id = int(params['chat_id'])
+            result = self._message(chat_id, text=params.get('text', ''))
+            self._reply(chat_id, 'text', params.get('text', ''))
+        elif method == 'sendVoice':
+            chat_id = int(params['chat_id'])
+            result = self._message(chat_id, voice={'file_id': 'reply', 'file_unique_id': 'reply', 'duration': 1})
+            self._reply(chat_id, 'voice')
+        elif method == 'getFile':
+            file_id = params.get('file_id', 'voice')
+            result = {'file_id': file_id, 'file_unique_id': file_id, 'file_size': len(self.voice_bytes),
+                      'file_path': f"voice/{file_id}.ogg"}
+        else:
+            result = True
+        self._send(request, 200, json.dumps({'ok': True, 'result': result}).encode(), 'application/json')
+
+    @staticmethod
+    def _send(request, status, body, content_type):
+        request.send_response(status)
+        request.send_header('Content-Type', content_type)
+        request.send_header('Content-Length', str(len(body)))
+        request.end_headers()
+        request.wfile.write(body)
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q / 100 * len(values)))]
+
+
+# Один пользователь проходит сценарий, ожидая ответа на каждое сообщение
+def run_user(server, chat_id, script, timeout, results):
+    for step in script:
+        voice = isinstance(step, tuple)
+        if voice and not server.voice_bytes:
+            continue
+        start = time.perf_counter()
+        waiter = server.push(chat_id, None if voice else step, voice=voice)
+        answered = waiter['event'].wait(timeout)
+        latency = time.perf_counter() - start
+        error_reply = answered and waiter['text'] is not None and waiter['text'].startswith(ERROR_REPLIES)
+        results.append({'voice': voice, 'ok': answered and not error_reply, 'timeout': not answered,
+                        'error_reply': error_reply, 'latency': latency, 'kind': waiter['kind']})
+
+
+def report(results, elapsed):
+    print(f"Сообщений: {len(results)}, время: {elapsed:.1f} с, пропускная способность: "
+          f"{sum(r['ok'] for r in results) / elapsed:.1f} ответов/с")
+    for name, subset in (('text', [r for r in results if not r['voice']]),
+                         ('voice', [r for r in results if r['voice']])):
+        if not subset:
+            continue
+        latencies = [r['latency'] * 1000 for r in subset if r['ok']]
+        errors = sum(not r['ok'] for r in subset)
+        timeouts = sum(r['timeout'] for r in subset)
+        error_replies = sum(r['error_reply'] for r in subset)
+        voice_replies = sum(r['kind'] == 'voice' for r in subset)
+        print(f"{name:5s}: n={len(subset)} ошибок={errors} ({errors / len(subset):.1%}; таймаутов {timeouts}, "
+              f"ответов с ошибкой {error_replies}) "
+              f"p50={percentile(latencies, 50):.0f} мс p90={percentile(latencies, 90):.0f} мс "
+              f"p99={percentile(latencies, 99):.0f} мс max={max(latencies, default=0):.0f} мс"
+              + (f" голосом={voice_replies}" if name == 'voice' else ""))
+
+
+# Тестовый звук: тон в OGG/Opus как входящее голосовое и в MP3 как ответ «синтеза речи»
+def make_test_audio(seconds=1.0):
+    import av
+    import numpy as np
+    rate = 48000
+    samples = (np.sin(2 * np.pi * 440 * np.arange(int(rate * seconds)) / rate) * 8000).astype(np.int16)
+    result = []
+    for format_name, codec in (('ogg', 'libopus'), ('mp3', 'libmp3lame')):
+        output = io.BytesIO()
+        with av.open(output, 'w', format=format_name) as container:
+            stream = container.add_stream(codec, rate=rate)
+            stream.layout = 'mono'
+            resampler = av.AudioResampler(format=stream.format.name, layout='mono', rate=rate,
+                                          frame_size=stream.codec_context.frame_size or 960)
+            frame = av.AudioFrame.from_ndarray(samples.reshape(1, -1), format='s16', layout='mono')
+            frame.sample_rate = rate
+            pts = 0
+            for resampled in resampler.resample(frame) + resampler.resample(None):
+                resampled.pts = pts
+                pts += resampled.samples
+                container.mux(stream.encode(resampled))
+            container.mux(stream.encode(None))
+        result.append(output.getvalue())
+    return result
+
+
+# Процесс бота для теста: LOAD_TEST_SPEECH_URL в окружении подменяет Google STT и gTTS в bot.py
+def serve_bot():
+    import bot
+    bot.run_bot()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест бота с локальным Bot API")
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--rounds', type=int, default=1, help="сколько раз каждый пользователь повторяет сценарий")
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--timeout', type=float, default=30.0, help="ожидание ответа на сообщение, с")
+    parser.add_argument('--voice-file', help="OGG/Opus для голосовых шагов; по умолчанию генерируется тон")
+    parser.add_argument('--no-spawn', action='store_true', help="не запускать бота, он уже смотрит на --port")
+    parser.add_argument('--serve-bot', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.serve_bot:
+        serve_bot()
+        return
+
+    try:
+        voice_bytes, tts_bytes = make_test_audio()
+    except Exception as e:
+        logger.warning(f"Не удалось сгенерировать тестовый звук, голосовые шаги пропускаются: {e}")
+        voice_bytes, tts_bytes = b'', b''
+    if args.voice_file:
+        with open(args.voice_file, 'rb') as f:
+            voice_bytes = f.read()
+    server = FakeTelegramServer(port=args.port, voice_bytes=voice_bytes, tts_bytes=tts_bytes)
+    server.start()
+
+    bot_process = None
+    if not args.no_spawn:
+        env = dict(os.environ, TELEGRAM_TOKEN=TOKEN, TELEGRAM_API_URL=server.api_url,
+                   TELEGRAM_FILE_URL=server.file_url, **{SPEECH_URL_ENV: server.speech_url})
+        bot_process = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--serve-bot'], env=env)
+        # Прогрев: ждём первого ответа, чтобы не считать загрузку моделей
+        warmup = server.push(0, 'Привет')
+        if not warmup['event'].wait(300):
+            bot_process.terminate()
+            raise SystemExit("Бот не ответил на прогревочное сообщение")
+
+    logger.info(f"Нагрузочный тест: {args.users} пользователей, {args.rounds} повтор(ов) сценария")
+    results = []
+    threads = [
+        threading.Thread(target=run_user, args=(server, chat_id, SCRIPTS[chat_id % len(SCRIPTS)] * args.rounds,
+                                                args.timeout, results))
+        for chat_id in range(1, args.users + 1)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    report(results, time.perf_counter() - start)
+
+    if bot_process:
+        bot_process.terminate()
+        bot_process.wait()
+    server.stop()
+
+
+if __name__ == '__main__':
+    main()
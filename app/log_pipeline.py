@@ -0,0 +1,122 @@
+# ./app/log_pipeline.py
+
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import time
+from logging.handlers import QueueHandler, QueueListener
+
+_queue_handler = None
+_listener = None
+
+
+# Запись лога одной строкой JSON
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(record.created)) + f".{int(record.msecs):03d}",
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+            'pid': record.process,
+        }
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+# Прореживание частых сообщений: доля записей уровня INFO и ниже по имени логгера
+class SamplingFilter(logging.Filter):
+    """Правило для логгера действует и на его потомков ('bot' -> 'bot.dialog').
+
+    Предупреждения и ошибки проходят всегда.
+    """
+
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = rates
+        self.resolved = {}
+
+    def rate_for(self, name):
+        rate = self.resolved.get(name)
+        if rate is None:
+            rate = 1.0
+            parts = name.split('.')
+            for i in range(len(parts), 0, -1):
+                prefix = '.'.join(parts[:i])
+                if prefix in self.rates:
+                    rate = self.rates[prefix]
+                    break
+            self.resolved[name] = rate
+        return rate
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.rate_for(record.name)
+        return rate >= 1 or random.random() < rate
+
+
+# Постановка записи в очередь: в вызывающем потоке только подстановка аргументов
+class LazyQueueHandler(QueueHandler):
+    def prepare(self, record):
+        # Аргументы подставляются сразу: изменяемые объекты (словари статистики) могут поменяться
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def _make_formatter(fmt):
+    if fmt == 'json':
+        return JsonFormatter()
+    return logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+
+
+def _start_listener(handlers):
+    global _listener
+    log_queue = queue.SimpleQueue()
+    _queue_handler.queue = log_queue
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+
+
+def _restart_after_fork():
+    # Поток записи не переживает fork: воркеру нужна своя очередь и свой поток
+    if _listener is not None:
+        _start_listener(_listener.handlers)
+
+
+def stop_logging():
+    """Дописывает накопленные записи и останавливает поток записи."""
+    if _listener is not None and _listener._thread is not None:
+        _listener.stop()
+
+
+# Настройка логирования: запись в фоновом потоке через очередь
+def setup_logging(level='INFO', fmt='json', sampling=None, stream=None):
+    """Повторный вызов ничего не меняет, поэтому модули могут вызывать его при импорте."""
+    global _queue_handler
+    if _queue_handler is not None:
+        return
+    # Файл, строка, поток и имя процесса в формат не входят — не собираем их для каждой записи
+    logging._srcfile = None
+    logging.logThreads = False
+    logging.logMultiprocessing = False
+    handler = logging.StreamHandler(stream or sys.stderr)
+    handler.setFormatter(_make_formatter(fmt))
+    _queue_handler = LazyQueueHandler(None)
+    if sampling:
+        _queue_handler.addFilter(SamplingFilter(sampling))
+    _start_listener([handler])
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(_queue_handler)
+    atexit.register(stop_logging)
+    os.register_at_fork(after_in_child=_restart_after_fork)
@@ -0,0 +1,147 @@
+# ./app/outbound.py
+
+import asyncio
+import time
+import traceback
+from collections import Counter, deque
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter
+from admission import TokenBucket
+from utils import logger
+
+LATENCY_WINDOW = 1000
+IDLE_CHAT_SECONDS = 60
+
+
+# Очередь одного чата: ответы уходят строго по порядку
+class ChatQueue:
+    def __init__(self, rate, burst):
+        self.bucket = TokenBucket(rate, burst)
+        self.messages = deque()
+        self.task = None
+
+
+# Отправка ответов вне обработчиков: лимиты Telegram, повторы с паузой, метрики
+class OutboundDispatcher:
+    """У каждого чата с ответами в очереди своя задача-отправитель, поэтому повтор
+    в одном чате не задерживает остальные. Общий лимит — один TokenBucket на все чаты.
+    """
+
+    def __init__(self, global_rate=30.0, chat_rate=1.0, chat_burst=3, max_retries=3, backoff=1.0,
+                 queue_size=10000, max_flood_wait=300.0):
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_flood_wait = max_flood_wait
+        self.queue_size = queue_size
+        self.chats = {}
+        self.pending = 0
+        self.paused_until = 0.0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.counters = Counter()
+
+    def send(self, chat_id, request):
+        """Ставит в очередь корутинную функцию request (например, вызов reply_text); False, если очередь полна."""
+        if self.pending >= self.queue_size:
+            self.counters['dropped_queue'] += 1
+            return False
+        chat = self.chats.get(chat_id)
+        if chat is None:
+            self._prune()
+            chat = self.chats[chat_id] = ChatQueue(self.chat_rate, self.chat_burst)
+        chat.messages.append((time.monotonic(), request))
+        self.pending += 1
+        if chat.task is None or chat.task.done():
+            chat.task = asyncio.create_task(self._drain_chat(chat))
+        return True
+
+    def _prune(self):
+        # Лимиты простаивающих чатов давно восстановились, хранить их незачем
+        now = time.monotonic()
+        idle = [chat_id for chat_id, chat in self.chats.items()
+                if not chat.messages and now - chat.bucket.updated > IDLE_CHAT_SECONDS]
+        for chat_id in idle:
+            del self.chats[chat_id]
+
+    async def _wait(self, bucket):
+        while True:
+            pause = self.paused_until - time.monotonic()
+            if pause > 0:
+                await asyncio.sleep(pause)
+            elif bucket.take():
+                return
+            else:
+                await asyncio.sleep(bucket.wait_time())
+
+    async def _drain_chat(self, chat):
+        while chat.messages:
+            queued_at, request = chat.messages[0]
+            await self._wait(chat.bucket)
+            await self._wait(self.global_bucket)
+            await self._send_with_retries(request)
+            chat.messages.popleft()
+            self.pending -= 1
+            self.latencies.append(time.monotonic() - queued_at)
+
+    async def _send_with_retries(self, request):
+        # Попытки тратят только ошибки сети; ожидание по флуд-контролю ограничено отдельно — max_flood_wait
+        attempt = 0
+        flood_wait = 0.0
+        while attempt <= self.max_retries:
+            try:
+                await request()
+                self.counters['sent'] += 1
+                return
+            except RetryAfter as e:
+                # Флуд-контроль Telegram: приостанавливаем все отправки на указанное время
+                retry_after = getattr(e.retry_after, 'total_seconds', lambda: e.retry_after)()
+                self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+                self.counters['retry_after'] += 1
+                flood_wait += retry_after
+                if flood_wait > self.max_flood_wait:
+                    self.counters['failed'] += 1
+                    logger.error(f"Ответ не отправлен: флуд-контроль держит его дольше {self.max_flood_wait} с")
+                    return
+                logger.warning(f"Telegram просит подождать {retry_after} с перед отправкой")
+                await asyncio.sleep(max(0.0, self.paused_until - time.monotonic()))
+                self.counters['retries'] += 1
+            except (BadRequest, Forbidden) as e:
+                # Повтор не поможет: чат недоступен или запрос некорректен
+                self.counters['failed'] += 1
+                logger.error(f"Ответ не отправлен: {e}")
+                return
+            except NetworkError as e:
+                self.counters['network_errors'] += 1
+                logger.warning(f"Ошибка сети при отправке (попытка {attempt + 1}): {e}")
+                if attempt < self.max_retries:
+                    await asyncio.sleep(self.backoff * 2 ** attempt)
+                    self.counters['retries'] += 1
+                attempt += 1
+            except Exception as e:
+                self.counters['failed'] += 1
+                logger.error(f"Ответ не отправлен: {e}\n{traceback.format_exc()}")
+                return
+        self.counters['failed'] += 1
+        logger.error(f"Ответ не отправлен после {self.max_retries} повторов")
+
+    def snapshot(self):
+        latencies = sorted(self.latencies)
+        latency = {}
+        if latencies:
+            latency = {
+                'p50_ms': round(latencies[len(latencies) // 2] * 1000, 1),
+                'p95_ms': round(latencies[int(len(latencies) * 0.95)] * 1000, 1),
+                'max_ms': round(latencies[-1] * 1000, 1),
+            }
+        return {'queue_depth': self.pending, 'chats': len(self.chats), 'latency': latency, **self.counters}
+
+    async def stop(self, timeout=30.0):
+        """Дожидается отправки накопленных ответов, затем отменяет оставшиеся."""
+        tasks = [chat.task for chat in self.chats.values() if chat.task and not chat.task.done()]
+        if tasks:
+            _, left = await asyncio.wait(tasks, timeout=timeout)
+            for task in left:
+                task.cancel()
+            await asyncio.gather(*left, return_exceptions=True)
+        logger.info(f"Очередь отправки остановлена: {self.snapshot()}")
@@ -0,0 +1,57 @@
+# ./app/preload.py
+
+import gc
+from data.config import CONFIG
+from catalog import CATALOG
+from utils import CATALOG_MATCH_INDEX, get_morph_tagger, lemmatize_many, lemmatize_fast, logger
+
+MEMORY_FIELDS = ('Rss', 'Pss', 'Shared_Clean', 'Shared_Dirty', 'Private_Clean', 'Private_Dirty')
+
+
+# Прогрев лемматизаторов на фразах каталога и намерений
+def warm_lemmatizers():
+    get_morph_tagger()
+    phrases = list(CATALOG.names) + list(set(CATALOG.categories_flat))
+    for _, synonyms, _, category_synonyms in CATALOG.match_entries:
+        phrases += synonyms
+        for synonyms_of_category in category_synonyms.values():
+            phrases += synonyms_of_category
+    phrases += [ex for data in CONFIG['intents'].values() for ex in data['examples']]
+    for phrase in phrases:
+        lemmatize_fast(phrase)
+    lemmatize_many(phrases[:100])
+    CATALOG_MATCH_INDEX.get()
+
+
+# Загрузка всего тяжёлого состояния перед fork воркеров
+def preload(bot_factory):
+    """Создаёт бота, прогревает Natasha и каталог, затем замораживает сборщик мусора.
+
+    После gc.freeze() объекты родителя не попадают в поколения GC, поэтому
+    проходы сборщика в воркерах не трогают их заголовки и страницы остаются общими.
+    """
+    bot = bot_factory()
+    warm_lemmatizers()
+    # Ленивые свойства SQLite-каталога вычисляются до fork
+    len(CATALOG)
+    CATALOG.categories_flat
+    gc.collect()
+    gc.freeze()
+    logger.info(f"Предзагрузка завершена, заморожено объектов: {gc.get_freeze_count()}")
+    return bot
+
+
+# Общая и приватная память процесса в килобайтах (Linux)
+def process_memory(pid):
+    memory = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                key, _, value = line.partition(':')
+                if key in MEMORY_FIELDS:
+                    memory[key] = int(value.split()[0])
+    except OSError:
+        return {}
+    memory['Shared'] = memory.get('Shared_Clean', 0) + memory.get('Shared_Dirty', 0)
+    memory['Private'] = memory.get('Private_Clean', 0) + memory.get('Private_Dirty', 0)
+    return {key.lower(): memory[key] for key in ('Rss', 'Pss', 'Shared', 'Private') if key in memory}
@@ -0,0 +1,63 @@
+# ./app/profiling.py
+
+import cProfile
+import os
+import pstats
+import time
+from utils import logger
+
+
+# Профилирование обработки следующих N сообщений по команде администратора
+class MessageProfiler:
+    """Пока профилирование не запрошено, profile() лишь проверяет счётчик и вызывает функцию.
+
+    Профиль накапливается в одном cProfile.Profile по всем N сообщениям и после
+    последнего сохраняется в .pstats. В режиме воркеров у каждого процесса свой
+    профилировщик, поэтому профилируется шард, которому достался чат администратора.
+    """
+
+    def __init__(self, output_dir='profiles', top=15):
+        self.output_dir = output_dir
+        self.top = top
+        self.remaining = 0
+        self.chat_id = None
+        self.profiler = None
+        self.running = False
+
+    def start(self, count, chat_id):
+        self.remaining = count
+        self.chat_id = chat_id
+        self.profiler = cProfile.Profile()
+        logger.info(f"Профилирование следующих {count} сообщений включено")
+
+    def profile(self, func, *args):
+        """Вызывает func(*args); возвращает (результат, отчёт или None)."""
+        if not self.remaining or self.running:
+            return func(*args), None
+        self.running = True
+        try:
+            result = self.profiler.runcall(func, *args)
+        finally:
+            self.running = False
+        self.remaining -= 1
+        if self.remaining:
+            return result, None
+        return result, self.finish()
+
+    def finish(self):
+        """Сохраняет накопленный профиль и возвращает текст с самыми дорогими функциями."""
+        os.makedirs(self.output_dir, exist_ok=True)
+        path = os.path.join(self.output_dir, f"profile-{time.strftime('%Y%m%d-%H%M%S')}.pstats")
+        self.profiler.dump_stats(path)
+        stats = pstats.Stats(self.profiler)
+        self.profiler = None
+        logger.info(f"Профиль сохранён в {path}")
+        return f"Профиль сохранён в {path}\n\n" + self.report(stats)
+
+    def report(self, stats):
+        rows = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:self.top]
+        lines = [f"Всего {stats.total_tt * 1000:.1f} мс, по накопленному времени:"]
+        for (filename, line, name), (_, calls, tottime, cumtime, _) in rows:
+            location = f"{os.path.basename(filename)}:{line}" if line else filename
+            lines.append(f"{cumtime * 1000:8.1f} мс {tottime * 1000:8.1f} мс {calls:6d}  {name} ({location})")
+        return "\n".join(lines)
@@ -0,0 +1,104 @@
+# ./app/sentiment.py
+
+import os
+import pickle
+from array import array
+
+# Слова, меняющие знак следующей оценки
+NEGATIONS = frozenset({'не', 'нет', 'ни', 'никогда'})
+NEGATION_WINDOW = 3
+SEPARATOR = '\n'
+
+
+def normalize_key(text):
+    return text.replace('ё', 'е')
+
+
+# Компактный тональный словарь: отсортированные ключи в одной строке и массивы смещений и оценок
+class SentimentLexicon:
+    """Хранит леммы и биграммы лемм с оценками, поиск бинарный."""
+
+    def __init__(self, entries=()):
+        entries = sorted({normalize_key(key): score for key, score in entries}.items())
+        self.blob = SEPARATOR.join(key for key, _ in entries)
+        self.offsets = array('I')
+        position = 0
+        for key, _ in entries:
+            self.offsets.append(position)
+            position += len(key) + 1
+        self.offsets.append(position)
+        self.scores = array('f', (score for _, score in entries))
+
+    @classmethod
+    def load(cls, path):
+        """Читает TSV: 'лемма<TAB>оценка' или 'лемма лемма<TAB>оценка' для биграмм."""
+        entries = []
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+                key, score = line.rsplit('\t', 1)
+                entries.append((key, float(score)))
+        return cls(entries)
+
+    def save(self, path):
+        """Сохраняет уже отсортированные ключи и массивы, чтобы не сортировать TSV при каждом запуске."""
+        with open(f"{path}.tmp", 'wb') as f:
+            pickle.dump({'blob': self.blob, 'offsets': self.offsets, 'scores': self.scores}, f)
+        os.replace(f"{path}.tmp", path)
+
+    @classmethod
+    def load_compiled(cls, path):
+        with open(path, 'rb') as f:
+            data = pickle.load(f)
+        lexicon = cls.__new__(cls)
+        lexicon.blob, lexicon.offsets, lexicon.scores = data['blob'], data['offsets'], data['scores']
+        return lexicon
+
+    def __len__(self):
+        return len(self.scores)
+
+    def _key(self, i):
+        return self.blob[self.offsets[i]:self.offsets[i + 1] - 1]
+
+    def get(self, key):
+        lo, hi = 0, len(self.scores)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            mid_key = self._key(mid)
+            if mid_key < key:
+                lo = mid + 1
+            elif mid_key > key:
+                hi = mid
+            else:
+                return self.scores[mid]
+        return None
+
+    def score_tokens(self, tokens):
+        """Один проход по леммам: биграммы важнее униграмм, отрицание меняет знак."""
+        tokens = [normalize_key(token) for token in tokens]
+        total = 0.0
+        count = 0
+        negation_left = 0
+        i = 0
+        while i < len(tokens):
+            token = tokens[i]
+            step = 1
+            score = self.get(f"{token} {tokens[i + 1]}") if i + 1 < len(tokens) else None
+            if score is not None:
+                step = 2
+            elif token in NEGATIONS:
+                negation_left = NEGATION_WINDOW
+                i += 1
+                continue
+            else:
+                score = self.get(token)
+            if score is not None:
+                total += -score if negation_left else score
+                count += 1
+                negation_left = 0
+            elif negation_left:
+                negation_left -= 1
+            i += step
+        return total, count
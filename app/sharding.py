@@ -0,0 +1,193 @@
+# ./app/sharding.py
+
+import asyncio
+import json
+import multiprocessing as mp
+import queue
+import signal
+import time
+from telegram import Update
+from telegram.ext import TypeHandler
+from data.config import CONFIG
+from preload import process_memory
+from utils import logger
+from log_pipeline import stop_logging
+
+STOP = None
+# Первые воркеры форкаются из чистого процесса после preload; перезапуск идёт из работающего фронта,
+# где уже есть потоки (executor, логирование, httpx), поэтому только через spawn
+RESTART_METHOD = 'spawn'
+CTX = mp.get_context(RESTART_METHOD)
+
+
+# Номер воркера для чата: все сообщения чата идут в один процесс
+def shard_for(chat_id, workers):
+    return hash(chat_id) % workers
+
+
+# Цикл воркера: своё приложение без Updater, user_data чатов живут только здесь
+def worker_main(index, updates, processed, errors, heartbeat, build_application, token, bot, bot_factory=None):
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if bot is None:
+        # Перезапущенный воркер не наследует память фронта и загружает модели сам
+        bot = bot_factory()
+
+    async def serve():
+        app = build_application(token, updater=False)
+        app.bot_data['bot'] = bot
+        loop = asyncio.get_running_loop()
+        async with app:
+            if app.post_init:
+                await app.post_init(app)
+            await app.start()
+            while True:
+                try:
+                    data = await loop.run_in_executor(None, updates.get, True, 1.0)
+                except queue.Empty:
+                    heartbeat.value = time.time()
+                    continue
+                if data is STOP:
+                    break
+                heartbeat.value = time.time()
+                try:
+                    await app.process_update(Update.de_json(json.loads(data), app.bot))
+                except Exception as e:
+                    errors.value += 1
+                    logger.error(f"Воркер {index}: ошибка обработки обновления: {e}")
+                processed.value += 1
+            await app.stop()
+            if app.post_stop:
+                await app.post_stop(app)
+
+    asyncio.run(serve())
+    # Процесс multiprocessing завершается без atexit: дописываем лог явно
+    stop_logging()
+
+
+class Worker:
+    def __init__(self, index, queue_size):
+        self.index = index
+        self.queue_size = queue_size
+        # Объекты синхронизации из spawn-контекста годятся и для fork, и для перезапуска через spawn
+        self.updates = CTX.Queue(queue_size)
+        self.processed = CTX.Value('l', 0)
+        self.errors = CTX.Value('l', 0)
+        self.heartbeat = CTX.Value('d', 0.0)
+        self.restarts = 0
+        self.dropped = 0
+        self.process = None
+
+    def start(self, *args, method='fork'):
+        self.heartbeat.value = time.time()
+        self.process = mp.get_context(method).Process(
+            target=worker_main, name=f"bot-worker-{self.index}", daemon=True,
+            args=(self.index, self.updates, self.processed, self.errors, self.heartbeat, *args))
+        self.process.start()
+
+    def replace_queue(self):
+        """Новая очередь для перезапуска: убитый во время get() воркер мог оставить замок старой захваченным.
+
+        Что удаётся забрать из старой очереди без блокировки, переносится, остальное считается потерянным.
+        """
+        old, self.updates = self.updates, CTX.Queue(self.queue_size)
+        moved = 0
+        try:
+            while True:
+                self.updates.put_nowait(old.get(timeout=0.1))
+                moved += 1
+        except (queue.Empty, queue.Full):
+            pass
+        lost = old.qsize()
+        self.dropped += lost
+        old.close()
+        old.cancel_join_thread()
+        return moved, lost
+
+    def health(self):
+        return {
+            'worker': self.index,
+            'pid': self.process.pid if self.process else None,
+            'alive': bool(self.process and self.process.is_alive()),
+            'queue': self.updates.qsize(),
+            'processed': self.processed.value,
+            'errors': self.errors.value,
+            'heartbeat_age': round(time.time() - self.heartbeat.value, 1),
+            'restarts': self.restarts,
+            'dropped': self.dropped,
+            'memory_kb': process_memory(self.process.pid) if self.process else {},
+        }
+
+
+# Фронт-процесс: получает обновления и раскладывает их по воркерам по chat_id
+class ShardedDispatcher:
+    """Воркеры форкаются из процесса, где модели уже загружены (copy-on-write); упавший воркер
+    перезапускается через spawn и загружает модели заново."""
+
+    def __init__(self, token, application_builder, build_application, bot, workers, bot_factory):
+        self.token = token
+        self.application_builder = application_builder
+        self.build_application = build_application
+        self.bot = bot
+        self.bot_factory = bot_factory
+        self.workers = [Worker(i, CONFIG['sharding']['queue_size']) for i in range(workers)]
+        self._monitor_task = None
+
+    def start_workers(self):
+        for worker in self.workers:
+            worker.start(self.build_application, self.token, self.bot)
+        logger.info(f"Запущено воркеров: {len(self.workers)}")
+
+    async def route(self, update: Update, context):
+        chat = update.effective_chat
+        worker = self.workers[shard_for(chat.id if chat else 0, len(self.workers))]
+        # Без блокировки: переполненный шард не должен задерживать остальные, его обновления отбрасываются
+        try:
+            worker.updates.put_nowait(update.to_json())
+        except queue.Full:
+            worker.dropped += 1
+            if worker.dropped == 1 or worker.dropped % 100 == 0:
+                logger.warning(f"Очередь воркера {worker.index} переполнена, отброшено обновлений: {worker.dropped}")
+
+    def health(self):
+        return {'front_memory_kb': process_memory('self'), 'workers': [worker.health() for worker in self.workers]}
+
+    async def monitor(self):
+        interval = CONFIG['sharding']['health_interval']
+        while True:
+            await asyncio.sleep(interval)
+            for worker in self.workers:
+                if not worker.process.is_alive():
+                    logger.error(f"Воркер {worker.index} завершился с кодом {worker.process.exitcode}, перезапуск")
+                    worker.restarts += 1
+                    moved, lost = worker.replace_queue()
+                    if lost:
+                        logger.warning(f"Воркер {worker.index}: перенесено обновлений {moved}, потеряно {lost}")
+                    worker.start(self.build_application, self.token, None, self.bot_factory,
+                                 method=RESTART_METHOD)
+            logger.info(f"Воркеры: {self.health()}")
+
+    async def _post_init(self, app):
+        self._monitor_task = asyncio.create_task(self.monitor())
+
+    async def _post_shutdown(self, app):
+        if self._monitor_task:
+            self._monitor_task.cancel()
+        self.stop_workers()
+
+    def stop_workers(self, timeout=30):
+        for worker in self.workers:
+            try:
+                worker.updates.put(STOP, timeout=1)
+            except queue.Full:
+                logger.warning(f"Очередь воркера {worker.index} заполнена, он будет остановлен принудительно")
+        for worker in self.workers:
+            worker.process.join(timeout)
+            if worker.process.is_alive():
+                worker.process.terminate()
+        logger.info("Воркеры остановлены")
+
+    def build_front(self):
+        front = self.application_builder(self.token) \
+            .post_init(self._post_init).post_shutdown(self._post_shutdown).build()
+        front.add_handler(TypeHandler(Update, self.route))
+        return front
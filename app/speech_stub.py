@@ -0,0 +1,25 @@
+# ./app/speech_stub.py
+
+import os
+import urllib.request
+from audio import decode_voice
+
+# Адрес заглушки распознавания и синтеза речи; задаётся нагрузочным тестом
+SPEECH_URL_ENV = 'LOAD_TEST_SPEECH_URL'
+
+
+def _post_speech(endpoint, data):
+    request = urllib.request.Request(f"{os.environ[SPEECH_URL_ENV]}/{endpoint}", data=data, method='POST',
+                                     headers={'Content-Type': 'application/octet-stream'})
+    with urllib.request.urlopen(request, timeout=10) as response:
+        return response.read()
+
+
+# Распознавание через заглушку: декодирование остаётся настоящим, по сети уходит только PCM
+def voice_to_text(voice_data):
+    return _post_speech('stt', decode_voice(voice_data)).decode() or None
+
+
+# Синтез предложения через заглушку
+def synthesize_sentence(sentence):
+    return _post_speech('tts', sentence.encode())
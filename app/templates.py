@@ -0,0 +1,61 @@
+# ./app/templates.py
+
+import re
+import string
+
+PLACEHOLDER_RE = re.compile(r'\[(\w+)\]')
+DEFAULT_DESCRIPTION = 'интересная игрушка'
+
+
+# Значения для подстановки; неизвестная метка остаётся в тексте как есть, например «[toy_name]»
+class Fragments(dict):
+    def __missing__(self, key):
+        return f"[{key}]"
+
+
+NO_FRAGMENTS = Fragments()
+
+
+# Ответ из CONFIG с метками [toy_name], [price] и т.п., разобранный один раз
+class Template:
+    """render() — один вызов format_map вместо цепочки str.replace; текст без меток возвращается как есть."""
+
+    __slots__ = ('text', 'fields', '_format')
+
+    def __init__(self, text):
+        self.text = text
+        self.fields = tuple(dict.fromkeys(PLACEHOLDER_RE.findall(text)))
+        escaped = text.replace('{', '{{').replace('}', '}}')
+        pattern = PLACEHOLDER_RE.sub(r'{\1}', escaped)
+        self._format = pattern.format_map if self.fields else None
+        # format_map понимает только именованные поля: «[0]» дал бы позиционное и упал при ответе
+        for _, field, _, _ in string.Formatter().parse(pattern):
+            if field is not None and not field.isidentifier():
+                raise ValueError(f"Недопустимая метка [{field}] в шаблоне {text!r}")
+
+    def render(self, fragments=NO_FRAGMENTS):
+        return self._format(fragments) if self._format else self.text
+
+    def __repr__(self):
+        return f"Template({self.text!r})"
+
+
+# Шаблоны ответов по намерениям
+def compile_responses(intents):
+    return {intent: [Template(response) for response in data.get('responses', [])]
+            for intent, data in intents.items()}
+
+
+# Возраст игрушки строкой: «3-8» или «14-и старше»
+def age_range(age):
+    return f"{age['min_age']}-{age['max_age'] or 'и старше'}"
+
+
+# Готовые фрагменты ответа об игрушке, считаются при загрузке каталога
+def toy_fragments(toy_name, data):
+    return Fragments(
+        toy_name=toy_name,
+        price=str(data['price']),
+        age=age_range(data['age']),
+        description=data.get('description', DEFAULT_DESCRIPTION),
+    )
@@ -0,0 +1,47 @@
+# ./app/tfidf.py
+
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+from data.config import CONFIG
+
+
+# TF-IDF векторайзер для модели: model — 'dialogues' или 'intents'
+def make_vectorizer(model, compact=None, documents=None):
+    """При compact веса хранятся в float32, а на корпусе не меньше prune_from документов
+    редкие n-граммы отбрасываются (min_df/max_features из CONFIG)."""
+    if compact is None:
+        compact = CONFIG['tfidf']['compact']
+    params = {}
+    if compact:
+        params = dict(CONFIG['tfidf'][model], dtype=np.float32)
+        prune_from = params.pop('prune_from', 0)
+        if documents is not None and documents < prune_from:
+            params.pop('min_df', None)
+            params.pop('max_features', None)
+    return TfidfVectorizer(analyzer='word', ngram_range=(1, 2), lowercase=True, **params)
+
+
+# Обучение векторайзера и компактная матрица
+def fit_tfidf(model, texts, compact=None):
+    vectorizer = make_vectorizer(model, compact, len(texts))
+    matrix = vectorizer.fit_transform(texts)
+    # stop_words_ хранит все отброшенные n-граммы и нужен только для отладки
+    if hasattr(vectorizer, 'stop_words_'):
+        del vectorizer.stop_words_
+    if matrix.dtype == np.float32:
+        matrix = compact_matrix(matrix)
+    return vectorizer, matrix
+
+
+# CSR-матрица с float32 весами и int32 индексами
+def compact_matrix(matrix):
+    matrix = matrix.tocsr().astype(np.float32)
+    if matrix.nnz < np.iinfo(np.int32).max:
+        matrix.indices = matrix.indices.astype(np.int32)
+        matrix.indptr = matrix.indptr.astype(np.int32)
+    return matrix
+
+
+# Память, занимаемая CSR-матрицей, в байтах
+def matrix_nbytes(matrix):
+    return matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes
@@ -0,0 +1,67 @@
+# ./app/tfidf_report.py
+
+import pickle
+import sys
+import time
+from sklearn.metrics.pairwise import linear_kernel
+from data.config import CONFIG
+from tfidf import fit_tfidf, matrix_nbytes
+from utils import lemmatize_many, logger
+
+QUERIES_LIMIT = 1000
+
+
+# Пары вопрос-ответ из dialogues.txt
+def load_dialogues(limit=None):
+    with open('data/dialogues.txt', encoding='utf-8') as f:
+        content = f.read()
+    dialogues = [d.split('\n')[:2] for d in content.split('\n\n') if len(d.split('\n')) >= 2]
+    dialogues = [(q[1:].strip() if q.startswith('-') else q, a[1:].strip() if a.startswith('-') else a)
+                 for q, a in dialogues]
+    return dialogues[:limit]
+
+
+# Ответ, который выбрал бы бот, или None ниже порога
+def lookup(vectorizer, matrix, answers, query):
+    similarities = linear_kernel(vectorizer.transform([query]), matrix).flatten()
+    best_idx = similarities.argmax()
+    return answers[best_idx] if similarities[best_idx] > CONFIG['thresholds']['dialogues_similarity'] else None
+
+
+def evaluate(name, vectorizer, matrix, answers, queries):
+    start = time.perf_counter()
+    results = [lookup(vectorizer, matrix, answers, query) for query in queries]
+    latency = (time.perf_counter() - start) / max(len(queries), 1) * 1e6
+    print(f"{name:10s} словарь={len(vectorizer.vocabulary_):8d} матрица={matrix_nbytes(matrix) / 1024:9.1f} КБ "
+          f"({matrix.dtype}, индексы {matrix.indices.dtype}) векторайзер={len(pickle.dumps(vectorizer)) / 1024:9.1f} КБ "
+          f"поиск={latency:7.1f} мкс")
+    return results
+
+
+def agreement(name, full, compact):
+    same = sum(a == b for a, b in zip(full, compact))
+    found = sum(a is not None for a in full)
+    lost = sum(a is not None and b is None for a, b in zip(full, compact))
+    print(f"  {name}: совпадение ответов {same}/{len(full)} ({same / max(len(full), 1):.1%}), "
+          f"полная модель нашла {found}, компактная потеряла {lost}")
+
+
+if __name__ == '__main__':
+    limit = int(sys.argv[1]) if len(sys.argv) > 1 else None
+    dialogues = load_dialogues(limit)
+    logger.info(f"Диалогов: {len(dialogues)}")
+    questions = lemmatize_many([q for q, _ in dialogues])
+    answers = [a for _, a in dialogues]
+    # Запросы: сами вопросы и вопросы без последнего слова (неполная реплика пользователя)
+    queries = questions[:QUERIES_LIMIT]
+    truncated = [' '.join(q.split()[:-1]) or q for q in queries]
+
+    full = fit_tfidf('dialogues', questions, compact=False)
+    compact = fit_tfidf('dialogues', questions, compact=True)
+    print(f"Параметры компактной модели: {CONFIG['tfidf']['dialogues']}, float32")
+    full_exact = evaluate('полная', *full, answers, queries)
+    compact_exact = evaluate('компактная', *compact, answers, queries)
+    full_truncated = [lookup(*full, answers, q) for q in truncated]
+    compact_truncated = [lookup(*compact, answers, q) for q in truncated]
+    agreement('вопросы целиком', full_exact, compact_exact)
+    agreement('без последнего слова', full_truncated, compact_truncated)
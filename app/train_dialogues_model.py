@@ -1,8 +1,25 @@
 # ./app/train_dialogues_model.py
 
 import pickle
-from sklearn.feature_extraction.text import TfidfVectorizer
-from utils import clear_phrase, lemmatize_phrase, logger
+import sys
+from data.config import CONFIG
+from fingerprint import training_fingerprint, is_up_to_date, save_fingerprint
+
+ARTIFACTS = ['models/dialogues_vectorizer.pkl', 'models/dialogues_answers.pkl', 'models/dialogues_matrix.pkl']
+
+# Пропуск обучения, если dialogues.txt, параметры и код не менялись (--force — обучить заново)
+try:
+    fingerprint = training_fingerprint(__file__, {'tfidf': CONFIG['tfidf'], 'lemmatizer': CONFIG['lemmatizer']},
+                                       ['data/dialogues.txt'])
+except OSError:
+    # Об отсутствии файла сообщит чтение dialogues.txt ниже
+    fingerprint = None
+if fingerprint and is_up_to_date('dialogues_model', fingerprint, ARTIFACTS):
+    sys.exit(0)
+
+# Тяжёлые зависимости загружаются, только если обучение действительно нужно
+from tfidf import fit_tfidf, matrix_nbytes
+from utils import lemmatize_many, logger
 
 logger.info("Начинается обучение модели для dialogues.txt")
 
@@ -19,19 +36,22 @@ except Exception as e:
     exit(1)
 
 # Подготовка данных
-questions = [lemmatize_phrase(clear_phrase(q)) for q, _ in dialogues]
+questions = lemmatize_many([q for q, _ in dialogues])
 answers = [a for _, a in dialogues]
 
 # Обучение TF-IDF модели
-tfidf_vectorizer = TfidfVectorizer(analyzer='word', ngram_range=(1, 2), lowercase=True)
-tfidf_matrix = tfidf_vectorizer.fit_transform(questions)
+tfidf_vectorizer, tfidf_matrix = fit_tfidf('dialogues', questions)
+logger.info(f"Словарь: {len(tfidf_vectorizer.vocabulary_)} n-грамм, матрица {tfidf_matrix.shape}, "
+            f"{matrix_nbytes(tfidf_matrix) / 1024:.1f} КБ")
 
 # Сохранение модели
 with open('models/dialogues_vectorizer.pkl', 'wb') as f:
     pickle.dump(tfidf_vectorizer, f)
-with open('models/dialogues_matrix.pkl', 'wb') as f:
-    pickle.dump(tfidf_matrix, f)
 with open('models/dialogues_answers.pkl', 'wb') as f:
     pickle.dump(answers, f)
+# Матрица сохраняется последней: по её изменению бот перечитывает модель
+with open('models/dialogues_matrix.pkl', 'wb') as f:
+    pickle.dump(tfidf_matrix, f)
 
+save_fingerprint('dialogues_model', fingerprint)
 logger.info("Модель для dialogues.txt обучена и сохранена в ./models/")
@@ -2,25 +2,40 @@
 
 import pickle
 import os
-from sklearn.svm import LinearSVC
-from sklearn.feature_extraction.text import TfidfVectorizer
+import sys
 from data.config import CONFIG
-from utils import clear_phrase, lemmatize_phrase, logger
+from fingerprint import SOURCES, training_fingerprint, is_up_to_date, save_fingerprint
+
+ARTIFACTS = ['models/intent_model.pkl', 'models/intent_vectorizer.pkl', 'models/intent_compiled.pkl']
+
+# Пропуск обучения, если примеры, параметры и код не менялись (--force — обучить заново)
+fingerprint = training_fingerprint(__file__, {
+    'intents': {intent: data['examples'] for intent, data in CONFIG['intents'].items()},
+    'tfidf': CONFIG['tfidf'],
+    'lemmatizer': CONFIG['lemmatizer'],
+}, sources=(*SOURCES, 'intent_model.py'))
+if is_up_to_date('intent_model', fingerprint, ARTIFACTS):
+    sys.exit(0)
+
+# Тяжёлые зависимости загружаются, только если обучение действительно нужно
+from sklearn.svm import LinearSVC
+from intent_model import CompiledIntentModel, export_compiled_intent_model
+from tfidf import fit_tfidf
+from utils import lemmatize_many, logger
 
 logger.info("Начинается обучение модели для intents")
 
 # Подготовка данных
-X_text = []
+examples = []
 y = []
 for intent, data in CONFIG['intents'].items():
     for example in data['examples']:
-        lemmatized_example = lemmatize_phrase(clear_phrase(example))
-        X_text.append(lemmatized_example)
+        examples.append(example)
         y.append(intent)
+X_text = lemmatize_many(examples)
 
 # Векторайзер
-vectorizer = TfidfVectorizer(analyzer='word', ngram_range=(1, 2), lowercase=True)
-X = vectorizer.fit_transform(X_text)
+vectorizer, X = fit_tfidf('intents', X_text)
 
 # Обучение
 clf = LinearSVC()
@@ -35,4 +50,12 @@ with open('models/intent_model.pkl', 'wb') as f:
 with open('models/intent_vectorizer.pkl', 'wb') as f:
     pickle.dump(vectorizer, f)
 
+# Компактная форма для инференса без sklearn
+compiled = export_compiled_intent_model(vectorizer, clf, 'models/intent_compiled.pkl')
+compiled_model = CompiledIntentModel(**compiled)
+mismatches = sum(compiled_model.predict(text) != label for text, label in zip(X_text, clf.predict(X)))
+logger.info(f"Компактная модель: {len(compiled['vocabulary'])} признаков, {len(compiled['classes'])} классов, "
+            f"расхождений с LinearSVC: {mismatches}")
+save_fingerprint('intent_model', fingerprint)
+
 logger.info("Модель для intents обучена и сохранена в ./models/")
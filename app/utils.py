@@ -1,83 +1,176 @@
 # ./app/utils.py
 
 import logging
+import os
+import re
 import nltk
+from collections import OrderedDict
+from functools import lru_cache
 from rapidfuzz import process, fuzz
 from data.config import CONFIG
+from log_pipeline import setup_logging
+from sentiment import SentimentLexicon
+from catalog import CATALOG
 from natasha import (
     Segmenter,
     MorphVocab,
     NewsEmbedding,
-    NewsMorphTagger,
-    Doc
+    NewsMorphTagger
 )
 
 # Настройка логирования
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+setup_logging(CONFIG['logging']['level'], CONFIG['logging']['format'], CONFIG['logging']['sampling'])
 logger = logging.getLogger(__name__)
+# Частые сообщения о каждой реплике — в отдельных логгерах, чтобы их можно было прореживать
+stats_logger = logging.getLogger(f"{__name__}.stats")
 
 # Инициализация Natasha
 segmenter = Segmenter()
 morph_vocab = MorphVocab()
-emb = NewsEmbedding()
-morph_tagger = NewsMorphTagger(emb)
+_morph_tagger = None
 
 
-# Загрузка тонального словаря
-def load_tonal_dict():
-    tonal_dict = {}
+# Нейросетевой теггер загружается только при первом использовании
+def get_morph_tagger():
+    global _morph_tagger
+    if _morph_tagger is None:
+        _morph_tagger = NewsMorphTagger(NewsEmbedding())
+    return _morph_tagger
+
+
+# Загрузка тонального словаря: собранный build_lexicon.py, если он не старше TSV, иначе разбор TSV
+def load_tonal_lexicon(source=CONFIG['sentiment']['source'], path=CONFIG['sentiment']['path']):
     try:
-        with open('data/tonal_dict.txt', encoding='utf-8') as f:
-            for line in f:
-                word, score = line.strip().split('\t')
-                tonal_dict[word] = float(score)
+        # Собранный словарь годится, если исходника нет или он не новее словаря
+        if os.path.exists(path) and (not os.path.exists(source)
+                                     or os.path.getmtime(path) >= os.path.getmtime(source)):
+            return SentimentLexicon.load_compiled(path)
+        logger.info(f"Собранный тональный словарь {path} не найден или устарел, читается {source}")
+        return SentimentLexicon.load(source)
     except FileNotFoundError:
         logger.error("Файл tonal_dict.txt не найден")
-    return tonal_dict
+        return SentimentLexicon()
+
 
+TONAL_LEXICON = load_tonal_lexicon()
 
-TONAL_DICT = load_tonal_dict()
+
+ALPHABET = '1234567890qwertyuiopasdfghjklzxcvbnmабвгдеёжзийклмнопрстуфхцчшщъыьэюя- '
+# Всё, что вне алфавита, удаляется одним проходом регулярного выражения
+NOT_ALPHABET_RE = re.compile(f"[^{re.escape(ALPHABET)}]+")
+# Разделитель фраз при пакетной очистке: не входит в алфавит, поэтому сам по себе удаляется из текста
+BATCH_SEPARATOR = '\x00'
+NOT_ALPHABET_BATCH_RE = re.compile(f"[^{re.escape(ALPHABET)}{BATCH_SEPARATOR}]+")
 
 
 # Очистка фразы
 def clear_phrase(phrase):
     if not phrase:
         return ""
-    phrase = phrase.lower()
-    alphabet = '1234567890qwertyuiopasdfghjklzxcvbnmабвгдеёжзийклмнопрстуфхцчшщъыьэюя- '
-    return ''.join(symbol for symbol in phrase if symbol in alphabet).strip()
+    return NOT_ALPHABET_RE.sub('', phrase.lower()).strip()
+
+
+# Очистка списка фраз: все фразы склеиваются и чистятся одним вызовом lower() и sub()
+def clear_many(phrases):
+    phrases = [phrase or "" for phrase in phrases]
+    if not phrases:
+        return []
+    text = BATCH_SEPARATOR.join(phrases)
+    if text.count(BATCH_SEPARATOR) != len(phrases) - 1:
+        # Разделитель встретился внутри фразы — склейка неоднозначна
+        return [clear_phrase(phrase) for phrase in phrases]
+    return [phrase.strip() for phrase in NOT_ALPHABET_BATCH_RE.sub('', text.lower()).split(BATCH_SEPARATOR)]
+
+
+# Словарная лемматизация одного слова (pymorphy2) с ограниченной памятью
+@lru_cache(maxsize=CONFIG['lemmatizer']['memo_size'])
+def lemmatize_word(word):
+    parses = morph_vocab.parse(word)
+    return parses[0].normal_form if parses else word
+
+
+# Лемматизация с контекстной разметкой Natasha
+def _lemmatize_natasha(cleaned_phrase):
+    return _lemmatize_natasha_many([cleaned_phrase])[0]
+
+
+# Пакетная лемматизация Natasha: один прогон теггера по всем предложениям
+def _lemmatize_natasha_many(cleaned_phrases):
+    sentences = []
+    owners = []
+    for i, phrase in enumerate(cleaned_phrases):
+        for sent in segmenter.sentenize(phrase):
+            words = [token.text for token in segmenter.tokenize(sent.text)]
+            if words:
+                sentences.append(words)
+                owners.append(i)
+    lemmatized = [[] for _ in cleaned_phrases]
+    markups = get_morph_tagger().map(sentences) if sentences else []
+    for owner, markup in zip(owners, markups):
+        for token in markup.tokens:
+            lemma = morph_vocab.lemmatize(token.text, token.pos, token.feats)
+            lemmatized[owner].append(lemma if lemma else token.text)
+    return [' '.join(words) for words in lemmatized]
+
+
+# Быстрая лемматизация по словарю без снятия неоднозначности
+def _lemmatize_pymorphy(cleaned_phrase):
+    return ' '.join(lemmatize_word(word) for word in cleaned_phrase.split())
+
+
+# Быстрая пакетная лемматизация по словарю
+def _lemmatize_pymorphy_many(cleaned_phrases):
+    return [_lemmatize_pymorphy(phrase) for phrase in cleaned_phrases]
+
+
+LEMMATIZERS = {
+    'natasha': _lemmatize_natasha,
+    'pymorphy': _lemmatize_pymorphy,
+}
+BATCH_LEMMATIZERS = {
+    'natasha': _lemmatize_natasha_many,
+    'pymorphy': _lemmatize_pymorphy_many,
+}
 
 
 # Лемматизация и морфологический анализ
-def lemmatize_phrase(phrase):
+def lemmatize_phrase(phrase, backend=None):
     if not phrase:
         return ""
     cleaned_phrase = clear_phrase(phrase)
     if not cleaned_phrase:
         return ""
-    doc = Doc(cleaned_phrase)
-    doc.segment(segmenter)
-    doc.tag_morph(morph_tagger)
-    lemmatized_words = []
-    for token in doc.tokens:
-        token.lemmatize(morph_vocab)
-        lemma = token.lemma if token.lemma else token.text
-        lemmatized_words.append(lemma)
-    return ' '.join(lemmatized_words)
+    backend = backend or CONFIG['lemmatizer']['backend']
+    if backend not in LEMMATIZERS:
+        raise ValueError(f"Неизвестный лемматизатор: {backend}")
+    return LEMMATIZERS[backend](cleaned_phrase)
+
+
+# Лемматизация списка фраз за один проход, порядок сохраняется
+def lemmatize_many(phrases, backend=None):
+    backend = backend or CONFIG['lemmatizer']['backend']
+    if backend not in BATCH_LEMMATIZERS:
+        raise ValueError(f"Неизвестный лемматизатор: {backend}")
+    cleaned = clear_many(phrases)
+    non_empty = [i for i, phrase in enumerate(cleaned) if phrase]
+    results = [""] * len(cleaned)
+    for i, lemmatized in zip(non_empty, BATCH_LEMMATIZERS[backend]([cleaned[i] for i in non_empty])):
+        results[i] = lemmatized
+    return results
+
+
+# Быстрая лемматизация для поиска по каталогу и намерениям
+def lemmatize_fast(phrase):
+    return lemmatize_phrase(phrase, CONFIG['lemmatizer']['fast_backend'])
 
 
 # Анализ тональности
-def analyze_sentiment(phrase):
+def analyze_sentiment(phrase, lemmatized=None):
     if not phrase:
         return 'neutral'
-    lemmatized = lemmatize_phrase(phrase)
-    words = lemmatized.split()
-    sentiment_score = 0
-    count = 0
-    for word in words:
-        if word in TONAL_DICT:
-            sentiment_score += TONAL_DICT[word]
-            count += 1
+    if lemmatized is None:
+        lemmatized = lemmatize_phrase(phrase)
+    sentiment_score, count = TONAL_LEXICON.score_tokens(lemmatized.split())
     if count == 0:
         return 'neutral'
     avg_score = sentiment_score / count
@@ -95,52 +188,54 @@ def is_meaningful_text(text):
     return any(len(word) > 2 and all(c in 'абвгдеёжзийклмнопрстуфхцчшщъыьэюя' for c in word) for word in words)
 
 
-# Извлечение возраста
-def extract_age(replica):
-    replica = lemmatize_phrase(replica)
-    logger.info(f"Extracting age from: '{replica}'")
-    words = replica.split()
-    for i, word in enumerate(words):
-        if word.isdigit() and (i + 1 < len(words) and words[i + 1] in ['год', 'года', 'лет'] or 'для' in words[:i]):
-            logger.info(f"Found age: {word}")
-            return word
-    logger.info("Age not found")
-    return None
+# Леммы названий, синонимов и категорий каталога; пересчитываются только при смене версии каталога
+class _CatalogMatchIndex:
+    def __init__(self):
+        self.version = None
+        self.toys = []
+        self.categories = []
 
+    def get(self):
+        if self.version != CATALOG.version:
+            self._build()
+        return self
 
-# Извлечение цены
-def extract_price(replica):
-    replica = clear_phrase(replica)
-    logger.info(f"Extracting price from: '{replica}'")
-    if not replica:
-        return None
-    words = replica.split()
-    for i, word in enumerate(words):
-        if word.isdigit() and (
-                i + 1 < len(words) and words[i + 1] in ['рублей', 'руб'] or 'до' in words[:i] or 'дешевле' in words[
-                                                                                                              :i]):
-            logger.info(f"Found price: {word}")
-            return int(word)
-    logger.info("Price not found")
-    return None
+    def _build(self):
+        self.version = CATALOG.version
+        self.toys = []
+        self.categories = []
+        seen_categories = set()
+        for toy, synonyms, categories, category_synonyms in CATALOG.match_entries:
+            self.toys.append((toy, lemmatize_fast(toy), [lemmatize_fast(syn) for syn in synonyms],
+                              [toy] + synonyms))
+            for category in categories:
+                synonyms_of_category = category_synonyms.get(category, [])
+                key = (category, tuple(synonyms_of_category))
+                if key in seen_categories:
+                    continue
+                seen_categories.add(key)
+                self.categories.append((category, lemmatize_fast(category),
+                                        [lemmatize_fast(syn) for syn in synonyms_of_category]))
+        logger.info(f"Индекс поиска по каталогу: {len(self.toys)} игрушек, {len(self.categories)} категорий")
+
+
+CATALOG_MATCH_INDEX = _CatalogMatchIndex()
 
 
 # Извлечение игрушки
 def extract_toy_name(replica):
-    replica = lemmatize_phrase(replica)
+    replica = lemmatize_fast(replica)
     if not replica:
         return None
+    index = CATALOG_MATCH_INDEX.get()
     # Проверяем точное совпадение с названиями игрушек
-    for toy in CONFIG['toys'].keys():
-        toy_lemmatized = lemmatize_phrase(toy)
+    for toy, toy_lemmatized, _, _ in index.toys:
         if toy_lemmatized in replica:
             return toy
     # Проверяем синонимы и нечёткое соответствие
-    for toy, data in CONFIG['toys'].items():
-        synonyms_lemmatized = [lemmatize_phrase(syn) for syn in data.get('synonyms', [])]
+    for toy, _, synonyms_lemmatized, candidates in index.toys:
         if any(syn in replica for syn in synonyms_lemmatized):
             return toy
-        candidates = [toy] + data.get('synonyms', [])
         best_match = process.extractOne(replica, candidates, scorer=fuzz.partial_ratio)
         if best_match and best_match[1] > CONFIG['thresholds']['fuzzy_match_toy']:
             return toy
@@ -149,23 +244,19 @@ def extract_toy_name(replica):
     for i, word in enumerate(words):
         if word.isdigit() and (i + 1 < len(words) and words[i + 1] in ['элемент', 'элементов']) and 'пазл' in words:
             puzzle_name = f"Пазл {word} элементов"
-            if puzzle_name in CONFIG['toys']:
+            if puzzle_name in CATALOG:
                 return puzzle_name
     return None
 
 
 # Извлечение категории
 def extract_toy_category(replica):
-    replica = lemmatize_phrase(replica)
+    replica = lemmatize_fast(replica)
     if not replica:
         return None
-    for toy, data in CONFIG['toys'].items():
-        for category in data.get('categories', []):
-            category_lemmatized = lemmatize_phrase(category)
-            category_synonyms = data.get('category_synonyms', {}).get(category, [])
-            synonyms_lemmatized = [lemmatize_phrase(syn) for syn in category_synonyms]
-            if category_lemmatized in replica or any(syn in replica for syn in synonyms_lemmatized):
-                return category
+    for category, category_lemmatized, synonyms_lemmatized in CATALOG_MATCH_INDEX.get().categories:
+        if category_lemmatized in replica or any(syn in replica for syn in synonyms_lemmatized):
+            return category
     return None
 
 
@@ -195,4 +286,39 @@ class Stats:
         else:
             self.stats[type] = 1
         self.context.user_data['stats'] = self.stats
-        logger.info(f"Stats: {self.stats} | Вопрос: {replica} | Ответ: {answer}")
+        stats_logger.info("Stats: %s | Вопрос: %s | Ответ: %s", self.stats, replica, answer)
+
+
+# Ограниченный кэш с вытеснением давно неиспользованных записей
+class LRUCache:
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        if key in self.data:
+            self.data.move_to_end(key)
+            self.hits += 1
+            return self.data[key]
+        self.misses += 1
+        return default
+
+    def put(self, key, value):
+        self.data[key] = value
+        self.data.move_to_end(key)
+        if len(self.data) > self.maxsize:
+            self.data.popitem(last=False)
+
+    def clear(self):
+        self.data.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self.data),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+        }
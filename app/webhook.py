@@ -0,0 +1,130 @@
+# ./app/webhook.py
+
+import asyncio
+import json
+import signal
+import time
+from telegram import Update
+from tornado.httpserver import HTTPServer
+from tornado.web import Application as TornadoApplication, RequestHandler
+from utils import logger
+
+
+# Приём обновлений от Telegram
+class TelegramWebhookHandler(RequestHandler):
+    def initialize(self, server):
+        self.server = server
+
+    async def post(self):
+        secret_token = self.server.secret_token
+        if secret_token and self.request.headers.get('X-Telegram-Bot-Api-Secret-Token') != secret_token:
+            self.set_status(403)
+            return
+        if self.server.draining:
+            # Telegram повторит доставку, когда поднимется другой экземпляр
+            self.set_status(503)
+            return
+        try:
+            update = Update.de_json(json.loads(self.request.body), self.server.app.bot)
+        except (ValueError, TypeError) as e:
+            logger.error(f"Некорректное обновление в вебхуке: {e}")
+            self.set_status(400)
+            return
+        await self.server.app.update_queue.put(update)
+        self.set_status(200)
+
+
+# Проверка живости для балансировщика
+class HealthHandler(RequestHandler):
+    def initialize(self, server):
+        self.server = server
+
+    def get(self):
+        health = self.server.health()
+        self.set_status(503 if self.server.draining else 200)
+        self.set_header('Content-Type', 'application/json')
+        self.write(json.dumps(health))
+
+
+# Вебхук-сервер с корректной остановкой
+class WebhookServer:
+    """Принимает обновления по HTTP и при остановке дожидается обработки очереди."""
+
+    def __init__(self, app, webhook_url, listen='0.0.0.0', port=8443, url_path='telegram',
+                 secret_token=None, health_path='healthz', drain_timeout=30.0, extra_health=None):
+        self.app = app
+        self.webhook_url = webhook_url.rstrip('/')
+        self.listen = listen
+        self.port = port
+        self.url_path = url_path.strip('/')
+        self.secret_token = secret_token
+        self.health_path = health_path.strip('/')
+        self.drain_timeout = drain_timeout
+        self.extra_health = extra_health
+        self.draining = False
+        self.started_at = None
+
+    def health(self):
+        health = {
+            'status': 'draining' if self.draining else 'ok',
+            'uptime': round(time.monotonic() - self.started_at, 1) if self.started_at else 0,
+            'update_queue': self.app.update_queue.qsize(),
+        }
+        if self.extra_health:
+            health.update(self.extra_health())
+        return health
+
+    def _make_http_server(self):
+        routes = [
+            (f"/{self.url_path}", TelegramWebhookHandler, {'server': self}),
+            (f"/{self.health_path}", HealthHandler, {'server': self}),
+        ]
+        return HTTPServer(TornadoApplication(routes))
+
+    async def _drain(self):
+        """Ждёт, пока очередь обновлений опустеет, но не дольше drain_timeout."""
+        deadline = time.monotonic() + self.drain_timeout
+        while self.app.update_queue.qsize() and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+        left = self.app.update_queue.qsize()
+        if left:
+            logger.warning(f"Остановка вебхука: в очереди осталось {left} обновлений")
+
+    async def serve(self):
+        stop_event = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop_event.set)
+
+        async with self.app:
+            # Как run_webhook: хуки post_init/post_stop/post_shutdown приложения
+            if self.app.post_init:
+                await self.app.post_init(self.app)
+            await self.app.start()
+            http_server = self._make_http_server()
+            http_server.listen(self.port, self.listen)
+            await self.app.bot.set_webhook(
+                url=f"{self.webhook_url}/{self.url_path}",
+                secret_token=self.secret_token,
+                allowed_updates=Update.ALL_TYPES,
+            )
+            self.started_at = time.monotonic()
+            logger.info(f"Вебхук слушает {self.listen}:{self.port}/{self.url_path}")
+
+            await stop_event.wait()
+            logger.info("Вебхук останавливается, дожидаемся обработки сообщений...")
+            # Слушатель работает до конца очереди: вебхук отвечает 503, /healthz — «draining»
+            self.draining = True
+            await self._drain()
+            http_server.stop()
+            # stop() дожидается текущего обработчика и задач create_task
+            await self.app.stop()
+            if self.app.post_stop:
+                await self.app.post_stop(self.app)
+            await http_server.close_all_connections()
+        if self.app.post_shutdown:
+            await self.app.post_shutdown(self.app)
+        logger.info("Вебхук остановлен")
+
+    def run(self):
+        asyncio.run(self.serve())
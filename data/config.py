@@ -364,5 +364,80 @@ CONFIG = {
         'intent_score': 0.6,
         'fuzzy_match_toy': 85,
     },
+    'lemmatizer': {
+        'backend': 'natasha',
+        'fast_backend': 'pymorphy',
+        'memo_size': 50000,
+    },
+    'sentiment': {
+        'source': 'data/tonal_dict.txt',
+        'path': 'models/tonal_lexicon.pkl',
+    },
+    'catalog': {
+        'path': 'models/catalog.sqlite',
+        'hot_set_size': 1000,
+        'check_interval': 30,
+    },
+    'admission': {
+        'workers': 4,
+        'user_rate': 1.0,
+        'user_burst': 5,
+        'user_queue_size': 5,
+        # Сколько секунд задача (обычно голос) может уступать более приоритетным
+        'max_wait': 5.0,
+        # Предупреждение «слишком много сообщений» — не чаще раза в столько секунд на пользователя
+        'notify_interval': 10.0,
+    },
+    # Компактные TF-IDF модели: без редких n-грамм, float32
+    'tfidf': {
+        'compact': True,
+        # На маленьком корпусе n-грамма из одного вопроса — почти весь его смысл, там не прореживаем
+        'dialogues': {'min_df': 2, 'max_features': 50000, 'prune_from': 1000},
+        'intents': {'min_df': 1, 'max_features': None, 'prune_from': 0},
+    },
+    # Бюджет времени на сообщение: после него необязательные этапы пропускаются
+    'latency_budget': {
+        'enabled': True,
+        'seconds': 0.5,
+        # Голосовое сообщение: отсчёт идёт с загрузки файла, поэтому распознавание входит в бюджет
+        'voice_seconds': 3.0,
+        # При такой очереди допуска бюджет считается исчерпанным сразу
+        'queue_depth': 20,
+    },
+    'dialogue_cache': {
+        'size': 10000,
+        'check_interval': 30,
+        'log_every': 1000,
+    },
+    'logging': {
+        'level': 'INFO',
+        'format': 'json',
+        # Доля записей INFO, которые попадают в лог, по имени логгера
+        'sampling': {
+            'entities': 0.1,
+            'bot.dialog': 1.0,
+        },
+    },
+    'profiling': {
+        'dir': 'profiles',
+        'top': 15,
+        'default_messages': 20,
+        'max_messages': 1000,
+    },
+    # Очередь исходящих сообщений: лимиты Telegram — около 30 сообщений/с на бота и 1/с на чат
+    'outbound': {
+        'global_rate': 30.0,
+        'chat_rate': 1.0,
+        'chat_burst': 3,
+        'max_retries': 3,
+        'backoff': 1.0,
+        'queue_size': 10000,
+        # Сколько секунд флуд-контроля ждать ради одного ответа, прежде чем его отбросить
+        'max_flood_wait': 300.0,
+    },
+    'sharding': {
+        'queue_size': 1000,
+        'health_interval': 30,
+    },
     'history_limit': 5,
 }
@@ -0,0 +1,78 @@
+# ./tests/test_entities.py
+
+import os
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'app')]
+
+from benchmark_entities import CORPUS_PATH, FIELDS, load_corpus
+from catalog import CatalogIndex, CatalogStore, build_catalog_store
+from entities import extract_entities
+
+
+# Извлечение возраста и цены по размеченному корпусу data/entities_corpus.tsv
+class CorpusTest(unittest.TestCase):
+    def test_corpus(self):
+        corpus = load_corpus(os.path.join(ROOT, CORPUS_PATH))
+        self.assertTrue(corpus)
+        for phrase, expected in corpus:
+            with self.subTest(phrase=phrase):
+                entities = extract_entities(phrase)
+                self.assertEqual({field: getattr(entities, field) for field in FIELDS}, expected)
+
+
+# Диапазоны: единица после второго числа, подсказка перед первым или неоднозначность
+class RangeTest(unittest.TestCase):
+    def test_age_range_with_unit(self):
+        entities = extract_entities("для ребенка 3-5 лет")
+        self.assertEqual((entities.age, entities.age_max), (3, 5))
+
+    def test_price_range_with_currency(self):
+        entities = extract_entities("от 500 до 1000 рублей")
+        self.assertEqual((entities.price_min, entities.price), (500, 1000))
+
+    def test_range_without_cue_is_price(self):
+        entities = extract_entities("от 500 до 1000")
+        self.assertEqual((entities.price_min, entities.price, entities.age), (500, 1000, None))
+
+    def test_age_like_range_without_cue_is_ignored(self):
+        entities = extract_entities("от 3 до 5")
+        self.assertEqual((entities.age, entities.age_max, entities.price, entities.price_min),
+                         (None, None, None, None))
+
+
+# Фильтр каталога по диапазону возраста: подходят игрушки, чей возраст пересекается с диапазоном
+class AgeRangeFilterTest(unittest.TestCase):
+    TOYS = {
+        'Погремушка': {'price': 300, 'age': {'min_age': 0, 'max_age': 2}},
+        'Кубики': {'price': 500, 'age': {'min_age': 2, 'max_age': 4}},
+        'Конструктор': {'price': 2000, 'age': {'min_age': 6, 'max_age': None}},
+    }
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        path = os.path.join(self.tmp.name, 'catalog.db')
+        build_catalog_store(self.TOYS, path)
+        self.catalogs = [CatalogIndex(self.TOYS), CatalogStore(path)]
+
+    def tearDown(self):
+        self.catalogs[1].conn.close()
+        self.tmp.cleanup()
+
+    def test_single_age(self):
+        for catalog in self.catalogs:
+            with self.subTest(catalog=type(catalog).__name__):
+                self.assertEqual(catalog.filter(3), ['Кубики'])
+
+    def test_age_range(self):
+        for catalog in self.catalogs:
+            with self.subTest(catalog=type(catalog).__name__):
+                self.assertEqual(catalog.filter(1, age_max=7), ['Погремушка', 'Кубики', 'Конструктор'])
+                self.assertEqual(catalog.filter(3, age_max=5), ['Кубики'])
+
+
+if __name__ == '__main__':
+    unittest.main()